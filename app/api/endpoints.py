@@ -1,49 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import asyncio
 import os
 import shutil
+import threading
 import traceback
 from ..models.database import get_db, QueryLog
-from ..models.schemas import QuestionRequest, RAGResponse, QueryLogResponse
-from ..services.rag_service import RAGService
+from ..models.schemas import QuestionRequest, RAGResponse, QueryLogResponse, SearchRequest, SearchResponse
+from ..services.collection_manager import CollectionManager, CollectionNotFoundError, DEFAULT_COLLECTION
+from ..services.warmup import warmup_state
+from ..services.admission_controller import AdmissionController, AdmissionRejected, DeadlineExceeded
+import numpy as np
 import time
 
 router = APIRouter()
 
-# Inicialización lazy del servicio RAG
-_rag_service = None
+# Gestor de colecciones: se crea en el arranque (lifespan) y, si no, al primer uso
+_collection_manager = None
+_collection_manager_lock = threading.Lock()
 
-def get_rag_service():
-    """Obtiene o inicializa el servicio RAG de forma lazy"""
-    global _rag_service
-    if _rag_service is None:
-        try:
-            _rag_service = RAGService()
-            print("✅ RAG Service inicializado correctamente")
-        except Exception as e:
-            print(f"❌ Error inicializando RAG Service: {e}")
-            print(f"Traceback: {traceback.format_exc()}")
-            _rag_service = None
-    return _rag_service
+def get_collection_manager():
+    """Obtiene o inicializa el gestor de colecciones (una sola vez aunque haya concurrencia)"""
+    global _collection_manager
+    if _collection_manager is None:
+        with _collection_manager_lock:
+            if _collection_manager is None:
+                _collection_manager = CollectionManager()
+    return _collection_manager
+
+# Control de admisión compartido por todas las colecciones (el cuello de botella es Claude)
+_admission_controller = None
+
+def get_admission_controller():
+    """Obtiene o inicializa el control de admisión de /ask"""
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController()
+    return _admission_controller
+
+def get_rag_service(collection: str = DEFAULT_COLLECTION, create: bool = False):
+    """Obtiene el servicio RAG de una colección, cargándolo si es necesario
+    
+    Solo la subida de documentos crea colecciones (create=True); para el resto
+    de endpoints una colección inexistente es un 404. Puede cargar un vector
+    store desde disco: los endpoints async la llaman con run_in_threadpool.
+    """
+    try:
+        rag_service = get_collection_manager().get(collection, create=create)
+        return rag_service
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        print(f"❌ Error inicializando RAG Service ({collection}): {e}")
+        print(f"Traceback: {traceback.format_exc()}")
+        return None
+
+def resolve_collection(collection: str) -> str:
+    """Valida el nombre de colección y lo convierte en un error 400 si es inválido"""
+    try:
+        return CollectionManager.validate_name(collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/upload-document")
 async def upload_document(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    collection: str = Form(DEFAULT_COLLECTION),
+    tags: str = Form("")
 ):
     """Endpoint para subir y procesar documentos PDF y TXT"""
     try:
-        print(f"📄 Iniciando upload de: {file.filename}")
-        
-        # Verificar servicio RAG
-        rag_service = get_rag_service()
-        if not rag_service:
-            print("❌ RAG Service no disponible")
-            raise HTTPException(
-                status_code=503, 
-                detail="Servicio RAG no disponible. Error de configuración."
-            )
+        print(f"📄 Iniciando upload de: {file.filename} (colección: {collection})")
+        collection = resolve_collection(collection)
         
         # Validar archivo
         if not file.filename:
@@ -59,8 +91,17 @@ async def upload_document(
                 detail="Solo se aceptan archivos PDF y TXT"
             )
         
+        # Verificar servicio RAG (la colección se crea si no existe)
+        rag_service = await run_in_threadpool(get_rag_service, collection, create=True)
+        if not rag_service:
+            print("❌ RAG Service no disponible")
+            raise HTTPException(
+                status_code=503, 
+                detail="Servicio RAG no disponible. Error de configuración."
+            )
+        
         # Preparar directorio
-        documents_path = os.getenv("DOCUMENTS_PATH", "./documents")
+        documents_path = get_collection_manager().documents_path(collection)
         print(f"📁 Directorio de documentos: {documents_path}")
         
         try:
@@ -93,11 +134,14 @@ async def upload_document(
         
         # Procesar en background
         print("🔄 Iniciando procesamiento en background...")
-        background_tasks.add_task(process_document_background, file_path)
+        tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
+        background_tasks.add_task(process_document_background, file_path, collection, tag_list)
         
         response = {
             "message": f"Documento {file.filename} subido correctamente. Procesando en segundo plano.",
             "filename": file.filename,
+            "collection": collection,
+            "tags": tag_list,
             "status": "processing",
             "file_size": file_size,
             "file_path": file_path
@@ -114,25 +158,29 @@ async def upload_document(
         print(f"Traceback completo: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=error_msg)
 
-def process_document_background(file_path: str):
+def process_document_background(file_path: str, collection: str = DEFAULT_COLLECTION,
+                                tags: Optional[List[str]] = None):
     """Procesa documento en segundo plano"""
     try:
-        print(f"🔄 Iniciando procesamiento de: {file_path}")
+        print(f"🔄 Iniciando procesamiento de: {file_path} (colección: {collection})")
         
         # Verificar que el archivo existe
         if not os.path.exists(file_path):
             print(f"❌ Archivo no encontrado para procesamiento: {file_path}")
             return
         
-        rag_service = get_rag_service()
+        rag_service = get_rag_service(collection, create=True)
         if not rag_service:
             print("❌ RAG Service no disponible para procesamiento")
             return
         
         # Procesar documento
-        rag_service.process_new_document(file_path)
+        rag_service.process_new_document(file_path, tags=tags)
         print(f"✅ Documento procesado exitosamente: {file_path}")
         
+        # El vector store creció: respetar el presupuesto de memoria
+        get_collection_manager().enforce_memory_budget(keep=collection)
+        
         # Verificar estado
         if rag_service.is_ready():
             chunks_count = len(rag_service.document_processor.chunks)
@@ -149,7 +197,8 @@ async def ask_question(
 ):
     """Endpoint principal para hacer preguntas al sistema RAG"""
     try:
-        rag_service = get_rag_service()
+        collection = resolve_collection(request.collection)
+        rag_service = await run_in_threadpool(get_rag_service, collection)
         
         if not rag_service:
             raise HTTPException(
@@ -165,8 +214,34 @@ async def ask_question(
         
         start_time = time.time()
         
-        # Generar respuesta
-        response = await rag_service.answer_question(request.question)
+        # Generar respuesta: solo el cálculo líder de preguntas idénticas pasa
+        # por el control de admisión; el resto espera su resultado hasta su deadline
+        admission = get_admission_controller()
+        deadline_ms = request.deadline_ms or admission.default_deadline_ms
+        try:
+            response = await asyncio.wait_for(
+                rag_service.answer_question(
+                    request.question,
+                    filters=request.filters,
+                    allow_extractive=request.allow_extractive,
+                    admit=lambda compute: admission.run(
+                        compute,
+                        priority=request.priority,
+                        deadline_ms=request.deadline_ms
+                    )
+                ),
+                timeout=deadline_ms / 1000
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="El deadline de la petición expiró")
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=e.status_code,
+                detail=e.detail,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        except DeadlineExceeded as e:
+            raise HTTPException(status_code=504, detail=str(e))
         
         # Guardar en base de datos solo si la respuesta es exitosa
         if not response.answer.startswith("Error"):
@@ -189,24 +264,90 @@ async def ask_question(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/search", response_model=SearchResponse)
+async def search_chunks(request: SearchRequest):
+    """Búsqueda solo de recuperación: devuelve fragmentos sin llamar a Claude ni guardar historial"""
+    try:
+        collection = resolve_collection(request.collection)
+        rag_service = await run_in_threadpool(get_rag_service, collection)
+        
+        if not rag_service:
+            raise HTTPException(
+                status_code=503, 
+                detail="Servicio RAG no disponible. Error de configuración."
+            )
+        
+        if not rag_service.is_ready():
+            raise HTTPException(
+                status_code=503, 
+                detail="Sistema no listo. Necesita procesar documentos primero."
+            )
+        
+        return rag_service.search(
+            request.query,
+            top_k=request.top_k,
+            offset=request.offset,
+            filters=request.filters
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/status")
-async def get_system_status():
+async def get_system_status(collection: str = DEFAULT_COLLECTION):
     """Verifica el estado del sistema"""
-    rag_service = get_rag_service()
+    collection = resolve_collection(collection)
+    rag_service = await run_in_threadpool(get_rag_service, collection)
     
     if not rag_service:
         return {
             "status": "error",
+            "collection": collection,
             "total_chunks": 0,
             "message": "Servicio RAG no disponible"
         }
     
     return {
         "status": "ready" if rag_service.is_ready() else "not_ready",
+        "collection": collection,
+        "admission": get_admission_controller().stats(),
+        "retrieval_batching": rag_service.retrieval_batcher.stats(),
+        "search_cache": rag_service.search_cache.stats(),
         "total_chunks": len(rag_service.document_processor.chunks) if rag_service.is_ready() else 0,
         "message": "Sistema listo para responder preguntas" if rag_service.is_ready() else "Necesita procesar documentos"
     }
 
+@router.get("/documents")
+async def list_documents(collection: str = DEFAULT_COLLECTION):
+    """Lista los documentos indexados en una colección con sus metadatos"""
+    collection = resolve_collection(collection)
+    rag_service = await run_in_threadpool(get_rag_service, collection)
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="Servicio RAG no disponible. Error de configuración.")
+    
+    metadata = rag_service.document_processor.metadata
+    counts = np.bincount(metadata.doc_index, minlength=len(metadata.documents))
+    return {
+        "collection": collection,
+        "documents": [
+            {**document, "total_chunks": int(count)}
+            for document, count in zip(metadata.documents, counts)
+        ]
+    }
+
+@router.get("/collections")
+async def list_collections():
+    """Lista las colecciones disponibles y las cargadas en memoria"""
+    manager = get_collection_manager()
+    return {
+        "available": manager.available_collections(),
+        "loaded": manager.loaded_collections(),
+        "memory_usage_bytes": manager.memory_usage(),
+        "memory_budget_bytes": manager.max_memory_bytes
+    }
+
 @router.get("/history", response_model=List[QueryLogResponse])
 async def get_query_history(
     limit: int = 10,
@@ -221,13 +362,22 @@ async def get_query_history(
 
 @router.get("/health")
 async def health_check():
-    """Health check para monitoring"""
-    rag_service = get_rag_service()
+    """Liveness: el proceso responde (no carga ni inicializa servicios)"""
     return {
         "status": "healthy", 
         "service": "RAG API",
-        "rag_service_available": rag_service is not None
+        "rag_service_available": _collection_manager is not None
+    }
+
+@router.get("/ready")
+async def readiness_check():
+    """Readiness: 200 solo cuando el arranque y el precalentamiento terminaron"""
+    body = {
+        "ready": warmup_state.ready,
+        "warmup": warmup_state.to_dict(),
+        "loaded_collections": _collection_manager.loaded_collections() if _collection_manager else []
     }
+    return JSONResponse(status_code=200 if warmup_state.ready else 503, content=body)
 
 @router.get("/debug")
 async def debug_info():
@@ -249,7 +399,7 @@ async def debug_info():
                 "DATABASE_URL": os.getenv("DATABASE_URL", "No configurada"),
                 "DOCUMENTS_PATH": documents_path
             },
-            "rag_service_status": get_rag_service() is not None
+            "rag_service_status": await run_in_threadpool(get_rag_service) is not None
         }
     except Exception as e:
         return {"error": str(e), "traceback": traceback.format_exc()}
\ No newline at end of file
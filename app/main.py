@@ -1,18 +1,37 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from .api.endpoints import router
+from .api.endpoints import router, get_collection_manager
 from .models.database import create_tables
+from .services.warmup import (
+    warmup_state, warmup_enabled, warmup_in_background,
+    warmup_collections, warm_up_collections
+)
+import asyncio
 import uvicorn
 
-# Crear tablas al inicio
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
+    # Startup: crear tablas e inicializar servicios antes de recibir tráfico
     create_tables()
+    manager = get_collection_manager()
+    
+    app.state.warmup_task = None
+    if warmup_enabled():
+        warmup = asyncio.to_thread(warm_up_collections, manager, warmup_collections())
+        if warmup_in_background():
+            # /ready responde 503 hasta que termine
+            app.state.warmup_task = asyncio.create_task(warmup)
+        else:
+            await warmup
+    else:
+        warmup_state.start([])
+        warmup_state.finish()
+    
     yield
     # Shutdown
-    pass
+    if app.state.warmup_task is not None and not app.state.warmup_task.done():
+        app.state.warmup_task.cancel()
 
 app = FastAPI(
     title="RAG Sistema Musache",
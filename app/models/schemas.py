@@ -1,9 +1,21 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
+
+class SearchFilters(BaseModel):
+    document_ids: Optional[List[str]] = None
+    sources: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
 
 class QuestionRequest(BaseModel):
     question: str
+    collection: str = "default"
+    filters: Optional[SearchFilters] = None
+    priority: Literal["high", "normal", "low"] = "normal"
+    deadline_ms: Optional[int] = Field(default=None, gt=0)
+    allow_extractive: bool = False
 
 class DocumentChunk(BaseModel):
     content: str
@@ -16,6 +28,37 @@ class RAGResponse(BaseModel):
     context_chunks: List[DocumentChunk]
     response_time: str
     timestamp: datetime
+    route: Literal["llm", "extractive", "no_answer"] = "llm"
+
+class SearchRequest(BaseModel):
+    query: str
+    collection: str = "default"
+    filters: Optional[SearchFilters] = None
+    top_k: Optional[int] = Field(default=None, gt=0, le=100)
+    offset: int = Field(default=0, ge=0)
+
+class SearchHighlight(BaseModel):
+    start: int
+    end: int
+    term: str
+
+class SearchResult(BaseModel):
+    rank: int
+    content: str
+    page: int
+    similarity_score: float
+    document_id: str
+    source: Optional[str] = None
+    highlights: List[SearchHighlight]
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchResult]
+    top_k: int
+    offset: int
+    has_more: bool
+    cached: bool
+    response_time: str
 
 class QueryLogResponse(BaseModel):
     id: int
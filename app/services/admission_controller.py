@@ -0,0 +1,160 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+from typing import Any, Awaitable, Callable, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PRIORITY_CLASSES = {"high": 0, "normal": 1, "low": 2}
+
+class AdmissionRejected(Exception):
+    """La petición no se admite (cola llena o no llegaría a tiempo)"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+class DeadlineExceeded(Exception):
+    """El deadline de la petición expiró mientras se procesaba"""
+
+class AdmissionController:
+    """Control de admisión con cola acotada, prioridades y deadlines.
+
+    Como máximo `max_concurrency` peticiones se ejecutan a la vez; el resto
+    espera en una cola de prioridad de tamaño `max_queue`. Las peticiones se
+    rechazan de inmediato si la cola está llena o si la espera estimada
+    (a partir de la media móvil del tiempo de servicio) supera su deadline.
+    Si el deadline expira durante la ejecución, la tarea se cancela.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None,
+                 max_queue: Optional[int] = None,
+                 default_deadline_ms: Optional[int] = None,
+                 initial_service_time: Optional[float] = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("ASK_MAX_CONCURRENCY", 8))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("ASK_MAX_QUEUE", 32))
+        self.default_deadline_ms = default_deadline_ms or int(os.getenv("ASK_DEFAULT_DEADLINE_MS", 30000))
+        # Media móvil exponencial del tiempo de servicio (segundos)
+        self.avg_service_time = initial_service_time or float(os.getenv("ASK_INITIAL_SERVICE_TIME_S", 2.0))
+        self._alpha = 0.2
+
+        self._active = 0
+        self._waiters: List[list] = []  # heap de [prioridad, secuencia, future]
+        self._sequence = itertools.count()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self, priority: int) -> float:
+        """Espera estimada (segundos) para una nueva petición con esa prioridad"""
+        ahead = sum(1 for entry in self._waiters if entry[0] <= priority)
+        if self._active < self.max_concurrency and ahead == 0:
+            return 0.0
+        return (ahead + 1) * self.avg_service_time / self.max_concurrency
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "avg_service_time": round(self.avg_service_time, 3),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+    async def run(self, factory: Callable[[], Awaitable[Any]],
+                  priority: str = "normal",
+                  deadline_ms: Optional[int] = None) -> Any:
+        """Ejecuta factory() si se admite, respetando prioridad y deadline"""
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Prioridad inválida: {priority}")
+        level = PRIORITY_CLASSES[priority]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (deadline_ms or self.default_deadline_ms) / 1000
+
+        await self._acquire(level, deadline)
+        self.admitted += 1
+        start = loop.time()
+        try:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            return await asyncio.wait_for(factory(), timeout=remaining)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise DeadlineExceeded("El deadline de la petición expiró")
+        finally:
+            elapsed = loop.time() - start
+            self.avg_service_time += self._alpha * (elapsed - self.avg_service_time)
+            self._release()
+
+    def _reject(self, status_code: int, detail: str, retry_after: float):
+        self.rejected += 1
+        raise AdmissionRejected(status_code, detail, retry_after)
+
+    async def _acquire(self, level: int, deadline: float):
+        loop = asyncio.get_running_loop()
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return
+
+        wait = self.estimated_wait(level)
+        remaining = deadline - loop.time()
+        if wait > remaining:
+            self._reject(503, "Servicio saturado: la espera estimada supera el deadline", wait)
+
+        if len(self._waiters) >= self.max_queue:
+            # Cola llena: solo entra si desplaza a una petición de menor prioridad
+            worst = max(self._waiters, key=lambda entry: (entry[0], entry[1]), default=None)
+            if worst is None or worst[0] <= level:
+                self._reject(429, "Demasiadas peticiones en cola", wait)
+            self._remove(worst)
+            self.rejected += 1
+            worst[2].set_exception(AdmissionRejected(
+                503, "Petición desplazada por otra de mayor prioridad", wait
+            ))
+
+        future = loop.create_future()
+        entry = [level, next(self._sequence), future]
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=remaining)
+        except AdmissionRejected:
+            raise
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # El turno llegó justo al expirar: devolverlo
+                self._release()
+            else:
+                future.cancel()
+                self._remove(entry)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject(503, "El deadline expiró esperando turno", self.estimated_wait(level))
+
+    def _remove(self, entry: list):
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    def _release(self):
+        self._active -= 1
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._active += 1
+            future.set_result(True)
+            break
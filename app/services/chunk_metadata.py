@@ -0,0 +1,237 @@
+import os
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+LEGACY_DOCUMENT_ID = "legacy"
+
+def _to_timestamp(value: datetime) -> float:
+    """Convierte un datetime a timestamp (los datetimes sin zona se asumen UTC)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def _set_bits(packed: np.ndarray, start: int, end: int) -> np.ndarray:
+    """Marca los bits [start, end) de un bitmap empaquetado, ampliándolo si hace falta"""
+    if end <= start:
+        return packed
+    nbytes = (end + 7) // 8
+    if len(packed) < nbytes:
+        packed = np.concatenate([packed, np.zeros(nbytes - len(packed), dtype=np.uint8)])
+    first = start // 8
+    span = np.unpackbits(packed[first:nbytes])
+    span[start - first * 8:end - first * 8] = 1
+    packed[first:nbytes] = np.packbits(span)
+    return packed
+
+def _delete_bits(packed: np.ndarray, start: int, end: int, length: int) -> np.ndarray:
+    """Quita los bits [start, end) de un bitmap empaquetado desplazando los siguientes"""
+    first = start // 8
+    if len(packed) <= first:
+        return packed
+    tail = np.unpackbits(packed[first:], count=length - first * 8)
+    tail = np.delete(tail, np.s_[start - first * 8:end - first * 8])
+    return np.concatenate([packed[:first], np.packbits(tail)])
+
+class ChunkMetadataTable:
+    """Tabla columnar con los metadatos de cada chunk del vector store.
+
+    Los metadatos por chunk se guardan en arrays de numpy (una columna por
+    campo) y los de cada documento en una lista aparte. Los chunks de un
+    documento son contiguos, así que cada documento se guarda como un rango
+    (inicio, fin) y sus máscaras se construyen al filtrar. Solo los tags tienen
+    bitmap, empaquetado (1 bit por chunk) y actualizado de forma incremental.
+    """
+
+    def __init__(self):
+        self.documents: List[Dict] = []
+        self.doc_index = np.zeros(0, dtype=np.int32)
+        self.pages = np.zeros(0, dtype=np.int32)
+        self.uploaded_at = np.zeros(0, dtype=np.float64)
+        # El documento i ocupa los chunks [_offsets[i], _offsets[i + 1])
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._tag_bitmaps: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_index)
+
+    @classmethod
+    def for_chunks(cls, pages: List[int], document_id: str = LEGACY_DOCUMENT_ID,
+                   source: str = "") -> "ChunkMetadataTable":
+        """Crea una tabla donde todos los chunks pertenecen a un único documento"""
+        table = cls()
+        table.add_document(document_id, source, pages)
+        return table
+
+    def add_document(self, document_id: str, source: str, pages: List[int],
+                     tags: Optional[List[str]] = None,
+                     uploaded_at: Optional[float] = None):
+        """Agrega al final de la tabla los chunks de un documento"""
+        if uploaded_at is None:
+            uploaded_at = time.time()
+        index = len(self.documents)
+        self.documents.append({
+            "document_id": document_id,
+            "source": source,
+            "uploaded_at": uploaded_at,
+            "tags": sorted(set(tags or []))
+        })
+        start, count = len(self), len(pages)
+        self.doc_index = np.concatenate([self.doc_index, np.full(count, index, dtype=np.int32)])
+        self.pages = np.concatenate([self.pages, np.asarray(pages, dtype=np.int32)])
+        self.uploaded_at = np.concatenate([self.uploaded_at, np.full(count, uploaded_at, dtype=np.float64)])
+        self._offsets = np.append(self._offsets, start + count)
+        # Los bits que faltan al final de un bitmap son ceros: solo cambian los tags del documento
+        for tag in self.documents[index]["tags"]:
+            bitmap = self._tag_bitmaps.get(tag, np.zeros(0, dtype=np.uint8))
+            self._tag_bitmaps[tag] = _set_bits(bitmap, start, start + count)
+
+    def remove_document(self, document_id: str) -> np.ndarray:
+        """Elimina un documento y devuelve la máscara de chunks que se conservan"""
+        keep = np.ones(len(self), dtype=bool)
+        index = self._find_document(document_id)
+        if index is None:
+            return keep
+
+        start, end = self.document_range(index)
+        length = len(self)
+        keep[start:end] = False
+        self.doc_index = self.doc_index[keep]
+        self.pages = self.pages[keep]
+        self.uploaded_at = self.uploaded_at[keep]
+        # Reenumerar los documentos posteriores
+        self.doc_index[start:] -= 1
+        self._offsets = np.delete(self._offsets, index + 1)
+        self._offsets[index + 1:] -= end - start
+        for tag in list(self._tag_bitmaps):
+            bitmap = _delete_bits(self._tag_bitmaps[tag], start, end, length)
+            if bitmap.any():
+                self._tag_bitmaps[tag] = bitmap
+            else:
+                del self._tag_bitmaps[tag]
+        del self.documents[index]
+        return keep
+
+    def has_document(self, document_id: str) -> bool:
+        return self._find_document(document_id) is not None
+
+    def _find_document(self, document_id: str) -> Optional[int]:
+        for index, document in enumerate(self.documents):
+            if document["document_id"] == document_id:
+                return index
+        return None
+
+    def document_range(self, index: int) -> Tuple[int, int]:
+        """Rango (inicio, fin) de los chunks de un documento"""
+        return int(self._offsets[index]), int(self._offsets[index + 1])
+
+    def document_for_chunk(self, chunk_index: int) -> Dict:
+        """Metadatos del documento al que pertenece un chunk"""
+        return self.documents[int(self.doc_index[chunk_index])]
+
+    def rebuild_bitmaps(self):
+        """Recalcula los rangos por documento y los bitmaps por tag desde las columnas"""
+        # doc_index es no decreciente: los chunks de cada documento son contiguos
+        self._offsets = np.searchsorted(
+            self.doc_index, np.arange(len(self.documents) + 1)
+        ).astype(np.int64)
+        self._tag_bitmaps = {}
+        for index, document in enumerate(self.documents):
+            start, end = self.document_range(index)
+            for tag in document["tags"]:
+                bitmap = self._tag_bitmaps.get(tag, np.zeros(0, dtype=np.uint8))
+                self._tag_bitmaps[tag] = _set_bits(bitmap, start, end)
+
+    def _documents_mask(self, indices) -> np.ndarray:
+        """Máscara de chunks de unos documentos a partir de sus rangos"""
+        mask = np.zeros(len(self), dtype=bool)
+        for index in indices:
+            start, end = self.document_range(index)
+            mask[start:end] = True
+        return mask
+
+    def _tag_mask(self, tag: str) -> np.ndarray:
+        bitmap = self._tag_bitmaps.get(tag)
+        if bitmap is None:
+            return np.zeros(len(self), dtype=bool)
+        # count amplía con ceros los bitmaps más cortos que la tabla
+        return np.unpackbits(bitmap, count=len(self)).astype(bool)
+
+    def build_mask(self, filters) -> Optional[np.ndarray]:
+        """Construye la máscara de chunks candidatos para unos filtros.
+
+        Los campos se combinan con AND y los valores de un mismo campo con OR.
+        Devuelve None si no hay ningún filtro activo.
+        """
+        if filters is None:
+            return None
+
+        mask = None
+
+        def combine(current, bitmap):
+            return bitmap if current is None else current & bitmap
+
+        if filters.document_ids:
+            document_ids = set(filters.document_ids)
+            mask = combine(mask, self._documents_mask(
+                index for index, document in enumerate(self.documents)
+                if document["document_id"] in document_ids
+            ))
+
+        if filters.sources:
+            sources = set(filters.sources)
+            mask = combine(mask, self._documents_mask(
+                index for index, document in enumerate(self.documents)
+                if document["source"] in sources or os.path.basename(document["source"]) in sources
+            ))
+
+        if filters.tags:
+            bitmap = np.zeros(len(self), dtype=bool)
+            for tag in filters.tags:
+                bitmap |= self._tag_mask(tag)
+            mask = combine(mask, bitmap)
+
+        if filters.uploaded_after is not None:
+            mask = combine(mask, self.uploaded_at >= _to_timestamp(filters.uploaded_after))
+
+        if filters.uploaded_before is not None:
+            mask = combine(mask, self.uploaded_at <= _to_timestamp(filters.uploaded_before))
+
+        return mask
+
+    def memory_usage(self) -> int:
+        """Bytes aproximados ocupados por las columnas, los rangos y los bitmaps de tags"""
+        bitmaps = sum(bitmap.nbytes for bitmap in self._tag_bitmaps.values())
+        return (self.doc_index.nbytes + self.pages.nbytes + self.uploaded_at.nbytes +
+                self._offsets.nbytes + bitmaps)
+
+    def save(self, path: str):
+        """Guarda la tabla en disco (columnas en .npz y documentos en .json)"""
+        np.savez(
+            os.path.join(path, "metadata.npz"),
+            doc_index=self.doc_index,
+            pages=self.pages,
+            uploaded_at=self.uploaded_at
+        )
+        with open(os.path.join(path, "documents.json"), "w", encoding="utf-8") as f:
+            json.dump(self.documents, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["ChunkMetadataTable"]:
+        """Carga la tabla desde disco; devuelve None si no existe"""
+        columns_path = os.path.join(path, "metadata.npz")
+        documents_path = os.path.join(path, "documents.json")
+        if not (os.path.exists(columns_path) and os.path.exists(documents_path)):
+            return None
+
+        table = cls()
+        with np.load(columns_path) as columns:
+            table.doc_index = columns["doc_index"]
+            table.pages = columns["pages"]
+            table.uploaded_at = columns["uploaded_at"]
+        with open(documents_path, "r", encoding="utf-8") as f:
+            table.documents = json.load(f)
+        table.rebuild_bitmaps()
+        return table
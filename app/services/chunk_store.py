@@ -0,0 +1,250 @@
+import mmap
+import os
+import tempfile
+import zlib
+from array import array
+from typing import Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # zstd es opcional; zlib siempre está disponible
+    zstandard = None
+
+SUPPORTED_CODECS = ("none", "zlib", "zstd")
+
+class ChunkStoreCodecError(RuntimeError):
+    """El almacén guardado usa una compresión que no está disponible"""
+
+def _atomic_write(target: str, write):
+    """Escribe un archivo vía un temporal único y lo renombra sobre el destino.
+
+    El nombre temporal lo genera mkstemp, así que dos hilos que guardan el
+    mismo almacén a la vez no se pisan; gana la última escritura completa.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target) or ".",
+                                    prefix=f"{os.path.basename(target)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class CompactChunkStore:
+    """Almacén compacto de chunks de texto.
+
+    El texto de cada documento se guarda una sola vez, dividido en bloques
+    (opcionalmente comprimidos), y cada chunk es solo un registro
+    (documento, inicio, fin, página) en arrays tipados. El texto de un chunk
+    se reconstruye bajo demanda descomprimiendo únicamente los bloques que
+    cubre, así que el solapamiento entre chunks no duplica memoria.
+
+    Se comporta como una secuencia de tuplas (texto, página) para mantener
+    compatibilidad con el código que usaba una lista.
+
+    Cargado con mapped=True, los bloques son vistas sobre chunks_text.bin
+    mapeado en memoria: el texto se lee del disco bajo demanda y solo los
+    documentos agregados después ocupan memoria.
+    """
+
+    def __init__(self, codec: Optional[str] = None, block_size: Optional[int] = None):
+        codec = codec or os.getenv("CHUNK_STORE_COMPRESSION", "zlib")
+        if codec not in SUPPORTED_CODECS:
+            raise ValueError(f"Compresión no soportada: {codec}")
+        if codec == "zstd" and zstandard is None:
+            # Solo para almacenes nuevos; load() exige el códec con el que se guardó
+            print("⚠️  zstandard no instalado, usando zlib")
+            codec = "zlib"
+        self.codec = codec
+        self.block_size = block_size or int(os.getenv("CHUNK_STORE_BLOCK_SIZE", 16384))
+
+        # Bloques de texto comprimidos de todos los documentos (bytes o vistas del mmap)
+        self._blocks: List[bytes] = []
+        self._mapped_file: Optional[mmap.mmap] = None
+        # Por documento: primer bloque y longitud en caracteres
+        self._doc_first_block = array("q")
+        self._doc_length = array("q")
+        # Por chunk: documento, rango [inicio, fin) y página
+        self._chunk_doc = array("i")
+        self._chunk_start = array("q")
+        self._chunk_end = array("q")
+        self._chunk_page = array("i")
+
+    @classmethod
+    def from_chunks(cls, text_chunks: Sequence[Tuple[str, int]], **kwargs) -> "CompactChunkStore":
+        """Crea un almacén a partir de una lista de tuplas (texto, página)"""
+        store = cls(**kwargs)
+        for text, page in text_chunks:
+            store.add_document(text, [(0, len(text), page)])
+        return store
+
+    def __len__(self) -> int:
+        return len(self._chunk_doc)
+
+    def __getitem__(self, index: int) -> Tuple[str, int]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Índice de chunk fuera de rango")
+        return self.get_text(index), self._chunk_page[index]
+
+    def __iter__(self) -> Iterator[Tuple[str, int]]:
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def pages(self) -> List[int]:
+        return self._chunk_page.tolist()
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zlib":
+            return zlib.compress(data, 6)
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return data
+
+    def _decompress(self, data: bytes) -> bytes:
+        if self.codec == "zlib":
+            return zlib.decompress(data)
+        if self.codec == "zstd":
+            return zstandard.ZstdDecompressor().decompress(data)
+        return bytes(data)
+
+    def add_document(self, text: str, spans: Sequence[Tuple[int, int, int]]) -> int:
+        """Agrega el texto de un documento y sus chunks como rangos (inicio, fin, página)"""
+        doc = len(self._doc_first_block)
+        self._doc_first_block.append(len(self._blocks))
+        self._doc_length.append(len(text))
+        for offset in range(0, len(text), self.block_size):
+            block = text[offset:offset + self.block_size]
+            self._blocks.append(self._compress(block.encode("utf-8")))
+
+        for start, end, page in spans:
+            self._chunk_doc.append(doc)
+            self._chunk_start.append(start)
+            self._chunk_end.append(end)
+            self._chunk_page.append(page)
+        return doc
+
+    def get_text(self, index: int) -> str:
+        """Reconstruye el texto de un chunk descomprimiendo solo sus bloques"""
+        doc = self._chunk_doc[index]
+        start = self._chunk_start[index]
+        end = self._chunk_end[index]
+        if end <= start:
+            return ""
+
+        first_block = start // self.block_size
+        last_block = (end - 1) // self.block_size
+        base = self._doc_first_block[doc]
+        text = "".join(
+            self._decompress(self._blocks[base + block]).decode("utf-8")
+            for block in range(first_block, last_block + 1)
+        )
+        offset = first_block * self.block_size
+        return text[start - offset:end - offset]
+
+    def texts(self) -> Iterator[str]:
+        """Itera el texto de los chunks sin materializar una lista"""
+        for index in range(len(self)):
+            yield self.get_text(index)
+
+    def copy(self) -> "CompactChunkStore":
+        """Copia superficial (los bloques son inmutables y se comparten)"""
+        store = CompactChunkStore(codec=self.codec, block_size=self.block_size)
+        store._blocks = list(self._blocks)
+        store._mapped_file = self._mapped_file
+        for name in ("_doc_first_block", "_doc_length", "_chunk_doc",
+                     "_chunk_start", "_chunk_end", "_chunk_page"):
+            setattr(store, name, array(getattr(self, name).typecode, getattr(self, name)))
+        return store
+
+    def filter(self, keep: Sequence[bool]) -> "CompactChunkStore":
+        """Devuelve un almacén solo con los chunks marcados, descartando documentos sin chunks"""
+        store = CompactChunkStore(codec=self.codec, block_size=self.block_size)
+        remap = {}
+        for index, kept in enumerate(keep):
+            if not kept:
+                continue
+            doc = self._chunk_doc[index]
+            if doc not in remap:
+                remap[doc] = len(store._doc_first_block)
+                first = self._doc_first_block[doc]
+                count = -(-self._doc_length[doc] // self.block_size)
+                store._doc_first_block.append(len(store._blocks))
+                store._doc_length.append(self._doc_length[doc])
+                store._blocks.extend(self._blocks[first:first + count])
+                store._mapped_file = self._mapped_file
+            store._chunk_doc.append(remap[doc])
+            store._chunk_start.append(self._chunk_start[index])
+            store._chunk_end.append(self._chunk_end[index])
+            store._chunk_page.append(self._chunk_page[index])
+        return store
+
+    def memory_usage(self) -> int:
+        """Bytes aproximados ocupados por bloques y registros (sin contar los mapeados)"""
+        arrays = (self._doc_first_block, self._doc_length, self._chunk_doc,
+                  self._chunk_start, self._chunk_end, self._chunk_page)
+        return (sum(len(block) for block in self._blocks if isinstance(block, bytes)) +
+                sum(len(values) * values.itemsize for values in arrays))
+
+    def save(self, path: str):
+        """Guarda los registros en chunks_index.npz y los bloques en chunks_text.bin"""
+        block_offsets = np.zeros(len(self._blocks) + 1, dtype=np.int64)
+        np.cumsum([len(block) for block in self._blocks], out=block_offsets[1:])
+        _atomic_write(os.path.join(path, "chunks_index.npz"), lambda f: np.savez(
+            f,
+            codec=np.array(self.codec),
+            block_size=np.array(self.block_size),
+            block_offsets=block_offsets,
+            doc_first_block=np.frombuffer(self._doc_first_block, dtype=np.int64),
+            doc_length=np.frombuffer(self._doc_length, dtype=np.int64),
+            chunk_doc=np.frombuffer(self._chunk_doc, dtype=np.int32),
+            chunk_start=np.frombuffer(self._chunk_start, dtype=np.int64),
+            chunk_end=np.frombuffer(self._chunk_end, dtype=np.int64),
+            chunk_page=np.frombuffer(self._chunk_page, dtype=np.int32)
+        ))
+        def write_blocks(f):
+            for block in self._blocks:
+                f.write(block)
+        # Escritura atómica: un almacén cargado con mmap sigue leyendo el archivo anterior
+        _atomic_write(os.path.join(path, "chunks_text.bin"), write_blocks)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return (os.path.exists(os.path.join(path, "chunks_index.npz")) and
+                os.path.exists(os.path.join(path, "chunks_text.bin")))
+
+    @classmethod
+    def load(cls, path: str, mapped: bool = False) -> "CompactChunkStore":
+        """Carga un almacén guardado con save() (con mapped=True el texto se mapea, no se lee)"""
+        with np.load(os.path.join(path, "chunks_index.npz")) as index:
+            codec = str(index["codec"])
+            if codec == "zstd" and zstandard is None:
+                raise ChunkStoreCodecError(
+                    "El almacén de chunks está comprimido con zstd y zstandard no está "
+                    "instalado: instale zstandard para cargarlo"
+                )
+            store = cls(codec=codec, block_size=int(index["block_size"]))
+            block_offsets = index["block_offsets"]
+            store._doc_first_block = array("q", index["doc_first_block"].astype(np.int64).tobytes())
+            store._doc_length = array("q", index["doc_length"].astype(np.int64).tobytes())
+            store._chunk_doc = array("i", index["chunk_doc"].astype(np.int32).tobytes())
+            store._chunk_start = array("q", index["chunk_start"].astype(np.int64).tobytes())
+            store._chunk_end = array("q", index["chunk_end"].astype(np.int64).tobytes())
+            store._chunk_page = array("i", index["chunk_page"].astype(np.int32).tobytes())
+
+        with open(os.path.join(path, "chunks_text.bin"), "rb") as f:
+            if mapped and block_offsets[-1] > 0:
+                store._mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                data = memoryview(store._mapped_file)
+            else:
+                data = f.read()
+        store._blocks = [
+            data[block_offsets[i]:block_offsets[i + 1]]
+            for i in range(len(block_offsets) - 1)
+        ]
+        return store
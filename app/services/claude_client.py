@@ -10,9 +10,14 @@ class ClaudeClient:
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY no encontrada")
         
-        self.client = anthropic.Anthropic(api_key=api_key)
+        # Cliente asíncrono: no bloquea el event loop mientras Claude genera
+        self.client = anthropic.AsyncAnthropic(api_key=api_key)
+        self.model = os.getenv("CLAUDE_MODEL", "claude-3-haiku-20240307")
+        # Modelo para respuestas cortas con poco contexto
+        self.fast_model = os.getenv("CLAUDE_FAST_MODEL", self.model)
     
-    async def generate_response(self, context: str, question: str) -> str:
+    async def generate_response(self, context: str, question: str,
+                                max_tokens: int = 1000, model: str = None) -> str:
         """Generate response using Claude API with RAG context"""
         
         prompt = f"""Basándote únicamente en el siguiente contexto, responde la pregunta de manera precisa y completa.
@@ -31,9 +36,9 @@ Instrucciones:
 Respuesta:"""
 
         try:
-            message = self.client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=1000,
+            message = await self.client.messages.create(
+                model=model or self.model,
+                max_tokens=max_tokens,
                 temperature=0.1,
                 messages=[
                     {"role": "user", "content": prompt}
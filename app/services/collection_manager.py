@@ -0,0 +1,184 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from .document_processor import StoreWriter
+from .rag_service import RAGService
+from .claude_client import ClaudeClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_COLLECTION = "default"
+COLLECTION_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+class CollectionNotFoundError(LookupError):
+    """La colección no existe y no se pidió crearla"""
+
+class CollectionManager:
+    """Gestiona colecciones de documentos con vector stores independientes.
+
+    Cada colección se carga de forma lazy en su primer uso y las menos usadas
+    recientemente se descargan de memoria cuando se supera el presupuesto.
+    """
+
+    def __init__(self, base_path: Optional[str] = None,
+                 max_memory_mb: Optional[float] = None,
+                 claude_client: Optional[ClaudeClient] = None):
+        self.base_path = base_path or os.getenv("VECTOR_STORE_PATH", "./vector_store")
+        self.documents_base_path = os.getenv("DOCUMENTS_PATH", "./documents")
+        if max_memory_mb is None:
+            max_memory_mb = float(os.getenv("COLLECTIONS_MAX_MEMORY_MB", 512))
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+
+        # Un único cliente de Claude compartido por todas las colecciones
+        self._claude_client = claude_client
+        self._services: "OrderedDict[str, RAGService]" = OrderedDict()
+        self._lock = threading.RLock()
+        # Copia inmutable del orden LRU para leerla sin el lock (readiness, métricas)
+        self._loaded_snapshot: Tuple[str, ...] = ()
+        # Un StoreWriter por colección que sobrevive a la descarga de su servicio
+        self._store_writers: Dict[str, StoreWriter] = {}
+        # Serializa la carga de cada colección sin bloquear a las demás
+        self._loading_locks: Dict[str, threading.Lock] = {}
+
+    @staticmethod
+    def validate_name(collection: str) -> str:
+        """Valida el nombre de una colección"""
+        if not collection or not COLLECTION_NAME_PATTERN.match(collection):
+            raise ValueError(
+                f"Nombre de colección inválido: '{collection}'. "
+                "Use solo letras, números, '-' o '_' (máximo 64 caracteres)"
+            )
+        return collection
+
+    def collection_path(self, collection: str) -> str:
+        """Ruta del vector store de una colección.
+
+        La colección por defecto usa VECTOR_STORE_PATH directamente para
+        mantener compatibilidad con los vector stores existentes.
+        """
+        self.validate_name(collection)
+        if collection == DEFAULT_COLLECTION:
+            return self.base_path
+        return os.path.join(self.base_path, "collections", collection)
+
+    def documents_path(self, collection: str) -> str:
+        """Directorio donde se guardan los documentos subidos a una colección"""
+        self.validate_name(collection)
+        if collection == DEFAULT_COLLECTION:
+            return self.documents_base_path
+        return os.path.join(self.documents_base_path, "collections", collection)
+
+    def exists(self, collection: str) -> bool:
+        """Indica si una colección existe (la colección por defecto siempre existe)"""
+        self.validate_name(collection)
+        if collection == DEFAULT_COLLECTION:
+            return True
+        return os.path.isdir(self.collection_path(collection))
+
+    def store_writer(self, collection: str) -> StoreWriter:
+        """Lock de escritura del vector store de una colección"""
+        self.validate_name(collection)
+        with self._lock:
+            writer = self._store_writers.get(collection)
+            if writer is None:
+                writer = self._store_writers[collection] = StoreWriter()
+            return writer
+
+    def get(self, collection: str = DEFAULT_COLLECTION, create: bool = False) -> RAGService:
+        """Obtiene el servicio RAG de una colección, cargándolo si es necesario
+
+        Bloquea mientras carga el vector store: desde código async debe
+        llamarse en un hilo (run_in_threadpool). Solo con create=True se crea
+        una colección nueva (y su directorio); si no, una colección
+        inexistente lanza CollectionNotFoundError.
+        """
+        self.validate_name(collection)
+        with self._lock:
+            service = self._services.get(collection)
+            if service is not None:
+                self._services.move_to_end(collection)
+                self._publish_loaded()
+                return service
+
+            if not create and not self.exists(collection):
+                raise CollectionNotFoundError(f"Colección no encontrada: {collection}")
+
+            if self._claude_client is None:
+                self._claude_client = ClaudeClient()
+            loading_lock = self._loading_locks.setdefault(collection, threading.Lock())
+
+        # La carga se hace fuera del lock global: solo espera quien pide la misma colección
+        with loading_lock:
+            with self._lock:
+                service = self._services.get(collection)
+                if service is not None:
+                    self._services.move_to_end(collection)
+                    self._publish_loaded()
+                    return service
+
+            print(f"📂 Cargando colección: {collection}")
+            service = RAGService(
+                vector_store_path=self.collection_path(collection),
+                claude_client=self._claude_client,
+                store_writer=self.store_writer(collection)
+            )
+            with self._lock:
+                self._services[collection] = service
+                self._publish_loaded()
+                self.enforce_memory_budget(keep=collection)
+            return service
+
+    def enforce_memory_budget(self, keep: Optional[str] = None):
+        """Descarga las colecciones menos usadas hasta respetar el presupuesto de memoria"""
+        with self._lock:
+            while self.memory_usage() > self.max_memory_bytes:
+                victim = next(
+                    (name for name in self._services if name != keep), None
+                )
+                if victim is None:
+                    break
+                self.evict(victim)
+
+    def evict(self, collection: str) -> bool:
+        """Descarga una colección de memoria (sus datos permanecen en disco)"""
+        with self._lock:
+            if self._services.pop(collection, None) is None:
+                return False
+            self._publish_loaded()
+            print(f"♻️  Colección descargada de memoria: {collection}")
+            return True
+
+    def memory_usage(self) -> int:
+        """Bytes estimados ocupados por las colecciones cargadas"""
+        with self._lock:
+            return sum(
+                service.document_processor.memory_usage()
+                for service in self._services.values()
+            )
+
+    def loaded_collections(self) -> List[str]:
+        """Colecciones cargadas, de la menos a la más recientemente usada
+
+        No toma el lock: devuelve la última instantánea publicada, así que
+        nunca espera a una carga o descarga en curso.
+        """
+        return list(self._loaded_snapshot)
+
+    def _publish_loaded(self):
+        """Actualiza la instantánea de colecciones cargadas (con el lock tomado)"""
+        self._loaded_snapshot = tuple(self._services)
+
+    def available_collections(self) -> List[str]:
+        """Colecciones con vector store en disco"""
+        collections = [DEFAULT_COLLECTION]
+        collections_dir = os.path.join(self.base_path, "collections")
+        if os.path.isdir(collections_dir):
+            collections += sorted(
+                name for name in os.listdir(collections_dir)
+                if COLLECTION_NAME_PATTERN.match(name)
+                and os.path.isdir(os.path.join(collections_dir, name))
+            )
+        return collections
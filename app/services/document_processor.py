@@ -1,185 +1,644 @@
-import fitz  # PyMuPDF
 import os
-from typing import List, Tuple
+import re
+import copy
+import hashlib
+import threading
+from typing import Any, List, NamedTuple, Optional, Tuple
 import numpy as np
 import pickle
 from dotenv import load_dotenv
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from .chunk_metadata import ChunkMetadataTable, LEGACY_DOCUMENT_ID
+from .chunk_store import ChunkStoreCodecError, CompactChunkStore
+from .extraction_cache import PageExtractionCache
+from .out_of_core_indexer import (
+    OutOfCoreIndexBuilder, is_mapped, load_mapped_index,
+    mapped_index_exists, remove_mapped_index
+)
 
 load_dotenv()
 
-class DocumentProcessor:
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+# Mismo patrón de tokens que el vectorizer (token_pattern por defecto de sklearn)
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+def _top_k_positions(rows: np.ndarray, scores: np.ndarray, top_k: int,
+                     n_candidates: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top_k de una columna dispersa de similitudes, ordenado de mayor a menor.
+
+    Las filas ausentes de la columna tienen similitud 0; si hay menos de top_k
+    filas con puntuación se completa con filas a 0, igual que la búsqueda densa.
+    """
+    rows = np.asarray(rows)
+    scores = np.asarray(scores)
+    if len(rows) > top_k:
+        selected = np.argpartition(-scores, top_k - 1)[:top_k]
+        rows, scores = rows[selected], scores[selected]
+    order = np.argsort(-scores, kind="stable")
+    rows, scores = rows[order], scores[order]
+
+    missing = min(top_k, n_candidates) - len(rows)
+    if missing > 0:
+        fill = np.setdiff1d(np.arange(len(rows) + missing), rows)[:missing]
+        rows = np.concatenate([rows, fill])
+        scores = np.concatenate([scores, np.zeros(len(fill), dtype=scores.dtype)])
+    return rows, scores
+
+class StoreWriter:
+    """Serializa las escrituras de un vector store en disco.
+
+    Lo comparten todas las instancias que usan el mismo directorio (el
+    CollectionManager guarda uno por colección), así que una instancia
+    descargada que sigue procesando no compite con la recién cargada.
+    `generation` cuenta los guardados: una instancia cuyo estado es de una
+    generación anterior recarga el store antes de modificarlo.
+    """
+
     def __init__(self):
+        self.lock = threading.RLock()
+        self.generation = 0
+
+class IndexSnapshot(NamedTuple):
+    """Índice instalado: vectorizer, matriz, chunks y metadatos de una misma versión"""
+    version: int
+    vectorizer: Any
+    embeddings: Any
+    chunks: CompactChunkStore
+    metadata: ChunkMetadataTable
+
+class DocumentProcessor:
+    def __init__(self, vector_store_path: Optional[str] = None,
+                 store_writer: Optional[StoreWriter] = None):
         print("✅ Usando TF-IDF + Búsqueda Coseno (100% compatible con macOS)")
         self.chunk_size = int(os.getenv("CHUNK_SIZE", 1000))
         self.chunk_overlap = int(os.getenv("CHUNK_OVERLAP", 200))
-        self.vector_store_path = os.getenv("VECTOR_STORE_PATH", "./vector_store")
+        self.vector_store_path = vector_store_path or os.getenv("VECTOR_STORE_PATH", "./vector_store")
+        # "memory": TfidfVectorizer en memoria; "out_of_core": por lotes con índice en disco
+        self.index_build_mode = os.getenv("INDEX_BUILD_MODE", "memory")
+        self.index_batch_size = int(os.getenv("INDEX_BATCH_SIZE", 5000))
         self.documents_path = os.getenv("DOCUMENTS_PATH", "./documents")
         
         # Crear directorios si no existen
         os.makedirs(self.vector_store_path, exist_ok=True)
         os.makedirs(self.documents_path, exist_ok=True)
         
-        self.chunks = []
+        self.chunks = CompactChunkStore()
         self.embeddings = None
         self.vectorizer = None
+        self.metadata = ChunkMetadataTable()
+        # Texto extraído por página, compartido entre colecciones
+        self.extraction_cache = None
+        if os.getenv("EXTRACTION_CACHE", "true").lower() in ("1", "true", "yes", "on"):
+            self.extraction_cache = PageExtractionCache()
+        # Se incrementa cada vez que cambia el índice (invalida resultados en vuelo o cacheados)
+        self.index_version = 0
+        self._snapshot = IndexSnapshot(0, None, None, self.chunks, self.metadata)
+        # Escrituras serializadas por store; generación del store que refleja esta instancia
+        self.store_writer = store_writer or StoreWriter()
+        self._store_generation = self.store_writer.generation
         
-    def extract_text_from_pdf(self, pdf_path: str) -> List[Tuple[str, int]]:
-        """Extrae texto de un PDF y devuelve chunks con número de página"""
-        doc = fitz.open(pdf_path)
-        text_chunks = []
-        
-        for page_num in range(doc.page_count):
-            page = doc[page_num]
-            text = page.get_text()
-            
-            # Dividir en chunks con overlap
-            chunks = self._split_text_into_chunks(text)
-            for chunk in chunks:
-                if chunk.strip():  # Solo agregar chunks no vacíos
-                    text_chunks.append((chunk, page_num + 1))
+    def _read_pdf_pages(self, pdf_path: str) -> List[str]:
+        """Extrae el texto de cada página de un PDF con PyMuPDF"""
+        import fitz  # PyMuPDF (importación diferida: es costosa y solo se usa al procesar)
         
+        doc = fitz.open(pdf_path)
+        pages = [doc[page_num].get_text() for page_num in range(doc.page_count)]
         doc.close()
-        return text_chunks
+        return pages
     
-    def extract_text_from_txt(self, txt_path: str) -> List[Tuple[str, int]]:
-        """Extrae texto de un archivo TXT y devuelve chunks"""
-        text_chunks = []
-        
+    def _read_txt_pages(self, txt_path: str) -> List[str]:
+        """Lee un archivo TXT como una única página"""
         with open(txt_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            
-            # Dividir en chunks con overlap
-            chunks = self._split_text_into_chunks(content)
-            for i, chunk in enumerate(chunks):
-                if chunk.strip():  # Solo agregar chunks no vacíos
-                    text_chunks.append((chunk, i + 1))  # Simular páginas
-        
-        return text_chunks
+            return [file.read()]
     
-    def extract_text_from_document(self, file_path: str) -> List[Tuple[str, int]]:
-        """Extrae texto según el tipo de archivo"""
+    def extract_pages_from_document(self, file_path: str,
+                                    document_id: Optional[str] = None) -> List[str]:
+        """Extrae el texto por página, usando la caché de extracción si está disponible"""
         file_extension = os.path.splitext(file_path)[1].lower()
-        
         if file_extension == '.pdf':
-            return self.extract_text_from_pdf(file_path)
+            reader = self._read_pdf_pages
         elif file_extension == '.txt':
-            return self.extract_text_from_txt(file_path)
+            reader = self._read_txt_pages
         else:
             raise ValueError(f"Formato de archivo no soportado: {file_extension}")
+        
+        if self.extraction_cache is None:
+            return reader(file_path)
+        
+        document_id = document_id or self.compute_document_id(file_path)
+        pages = self.extraction_cache.get_pages(document_id)
+        if pages is None:
+            pages = reader(file_path)
+            self.extraction_cache.put_pages(document_id, pages)
+        else:
+            print(f"📦 Texto leído de la caché de extracción: {document_id}")
+        return pages
     
-    def _split_text_into_chunks(self, text: str) -> List[str]:
-        """Divide el texto en chunks con overlap"""
-        chunks = []
+    def _spans_from_pages(self, pages: List[str],
+                          real_pages: bool) -> Tuple[str, List[Tuple[int, int, int]]]:
+        """Trocea las páginas y devuelve el texto completo y los rangos (inicio, fin, página)
+        
+        En PDFs los chunks no cruzan páginas; en TXT (una sola página) el
+        número de página se simula con el índice del chunk.
+        """
+        spans = []
+        offset = 0
+        
+        for page_num, text in enumerate(pages):
+            # Dividir en chunks con overlap
+            for i, (start, end) in enumerate(self._split_text_into_spans(text)):
+                if text[start:end].strip():  # Solo agregar chunks no vacíos
+                    page = page_num + 1 if real_pages else i + 1
+                    spans.append((offset + start, offset + end, page))
+            offset += len(text)
+        
+        return "".join(pages), spans
+    
+    def extract_spans_from_pdf(self, pdf_path: str) -> Tuple[str, List[Tuple[int, int, int]]]:
+        """Extrae el texto de un PDF y los chunks como rangos (inicio, fin, página)"""
+        return self._spans_from_pages(self._read_pdf_pages(pdf_path), real_pages=True)
+    
+    def extract_spans_from_txt(self, txt_path: str) -> Tuple[str, List[Tuple[int, int, int]]]:
+        """Extrae el texto de un archivo TXT y los chunks como rangos"""
+        return self._spans_from_pages(self._read_txt_pages(txt_path), real_pages=False)
+    
+    def extract_spans_from_document(self, file_path: str,
+                                    document_id: Optional[str] = None) -> Tuple[str, List[Tuple[int, int, int]]]:
+        """Extrae texto y rangos de chunks según el tipo de archivo"""
+        pages = self.extract_pages_from_document(file_path, document_id)
+        is_pdf = os.path.splitext(file_path)[1].lower() == '.pdf'
+        return self._spans_from_pages(pages, real_pages=is_pdf)
+    
+    def extract_text_from_pdf(self, pdf_path: str) -> List[Tuple[str, int]]:
+        """Extrae texto de un PDF y devuelve chunks con número de página"""
+        text, spans = self.extract_spans_from_pdf(pdf_path)
+        return [(text[start:end], page) for start, end, page in spans]
+    
+    def extract_text_from_txt(self, txt_path: str) -> List[Tuple[str, int]]:
+        """Extrae texto de un archivo TXT y devuelve chunks"""
+        text, spans = self.extract_spans_from_txt(txt_path)
+        return [(text[start:end], page) for start, end, page in spans]
+    
+    def extract_text_from_document(self, file_path: str) -> List[Tuple[str, int]]:
+        """Extrae texto según el tipo de archivo"""
+        text, spans = self.extract_spans_from_document(file_path)
+        return [(text[start:end], page) for start, end, page in spans]
+    
+    def _split_text_into_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Calcula los rangos (inicio, fin) de los chunks con overlap"""
+        spans = []
         start = 0
         
         while start < len(text):
             end = min(start + self.chunk_size, len(text))
-            chunk = text[start:end]
-            chunks.append(chunk)
+            spans.append((start, end))
             
             if end == len(text):
                 break
                 
             start = end - self.chunk_overlap
         
-        return chunks
+        return spans
     
-    def create_embeddings(self, text_chunks: List[Tuple[str, int]]):
-        """Crea embeddings TF-IDF para los chunks de texto"""
-        self.chunks = text_chunks
-        texts = [chunk[0] for chunk in text_chunks]
+    def _split_text_into_chunks(self, text: str) -> List[str]:
+        """Divide el texto en chunks con overlap"""
+        return [text[start:end] for start, end in self._split_text_into_spans(text)]
+    
+    @staticmethod
+    def compute_document_id(file_path: str) -> str:
+        """Identificador estable de un documento a partir del hash de su contenido"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()[:16]
+    
+    def create_embeddings(self, text_chunks,
+                          metadata: Optional[ChunkMetadataTable] = None):
+        """Crea embeddings TF-IDF para los chunks de texto
         
-        print(f"Creando embeddings TF-IDF para {len(texts)} chunks...")
+        Acepta una lista de tuplas (texto, página) o un CompactChunkStore.
+        El índice nuevo se construye aparte y se instala de una vez al final,
+        así que las búsquedas concurrentes siguen usando el anterior mientras tanto.
+        """
+        if not isinstance(text_chunks, CompactChunkStore):
+            text_chunks = CompactChunkStore.from_chunks(text_chunks)
+        if metadata is None or len(metadata) != len(text_chunks):
+            metadata = ChunkMetadataTable.for_chunks(text_chunks.pages)
         
-        # Usar TF-IDF
-        self.vectorizer = TfidfVectorizer(
-            max_features=1000, 
-            stop_words='english',
-            ngram_range=(1, 2),
-            min_df=1
-        )
-        self.embeddings = self.vectorizer.fit_transform(texts)
+        if self.index_build_mode == "out_of_core":
+            # Escribe segmentos y arrays con nombres fijos dentro del store
+            with self.store_writer.lock:
+                vectorizer, embeddings = self._create_embeddings_out_of_core(text_chunks)
+        else:
+            print(f"Creando embeddings TF-IDF para {len(text_chunks)} chunks...")
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            
+            # Usar TF-IDF
+            vectorizer = TfidfVectorizer(
+                max_features=1000, 
+                stop_words='english',
+                ngram_range=(1, 2),
+                min_df=1
+            )
+            # Los textos se descomprimen de uno en uno mientras se ajusta el vectorizer
+            embeddings = vectorizer.fit_transform(text_chunks.texts())
+            print(f"Embeddings creados: {embeddings.shape}")
         
-        print(f"Embeddings creados: {self.embeddings.shape}")
+        self._install_index(vectorizer, embeddings, text_chunks, metadata)
+    
+    def _install_index(self, vectorizer, embeddings, chunks: CompactChunkStore,
+                       metadata: ChunkMetadataTable):
+        """Sustituye el índice en uso; la versión se incrementa la última
+        
+        Quien lea la versión antes de buscar y la compare después sabe si la
+        búsqueda pudo usar un índice distinto. Quien necesite varias piezas del
+        índice a la vez debe tomarlas de snapshot(), que se sustituye de una vez.
+        """
+        self.vectorizer = vectorizer
+        self.embeddings = embeddings
+        self.chunks = chunks
+        self.metadata = metadata
+        self._snapshot = IndexSnapshot(self.index_version + 1, vectorizer, embeddings, chunks, metadata)
+        self.index_version += 1
+    
+    def snapshot(self) -> IndexSnapshot:
+        """Índice instalado actualmente, con todas sus piezas de la misma versión"""
+        return self._snapshot
+    
+    def _create_embeddings_out_of_core(self, text_chunks: CompactChunkStore):
+        """Crea el índice por lotes volcando segmentos a disco y devuelve (vectorizer, matriz).
+        
+        Los textos se descomprimen de lote en lote (los de documentos ya
+        indexados se leen del chunks_text.bin mapeado) y la matriz resultante se
+        escribe en el vector store y se carga con mmap. Solo el texto de los
+        documentos que se están agregando o re-troceando ocupa memoria.
+        """
+        print(f"Creando embeddings TF-IDF fuera de memoria para {len(text_chunks)} chunks "
+              f"(lotes de {self.index_batch_size})...")
+        builder = OutOfCoreIndexBuilder(self.vector_store_path)
+        
+        batch = []
+        for text in text_chunks.texts():
+            batch.append(text)
+            if len(batch) >= self.index_batch_size:
+                builder.add_batch(batch)
+                batch = []
+        if batch:
+            builder.add_batch(batch)
+        
+        vectorizer, embeddings = builder.finalize()
+        print(f"Embeddings creados: {embeddings.shape} ({len(builder.segments)} segmentos)")
+        return vectorizer, embeddings
     
     def save_vector_store(self):
         """Guarda el vector store en disco"""
+        with self.store_writer.lock:
+            self._save_vector_store()
+            self.store_writer.generation += 1
+            self._store_generation = self.store_writer.generation
+    
+    def _save_vector_store(self):
         if self.embeddings is not None:
             # Guardar vectorizer
             with open(os.path.join(self.vector_store_path, "vectorizer.pkl"), "wb") as f:
                 pickle.dump(self.vectorizer, f)
             
-            # Guardar embeddings
-            with open(os.path.join(self.vector_store_path, "embeddings.pkl"), "wb") as f:
-                pickle.dump(self.embeddings, f)
+            # Guardar embeddings (un índice construido fuera de memoria ya está en disco)
+            embeddings_path = os.path.join(self.vector_store_path, "embeddings.pkl")
+            if is_mapped(self.embeddings):
+                if os.path.exists(embeddings_path):
+                    os.remove(embeddings_path)
+            else:
+                with open(embeddings_path, "wb") as f:
+                    pickle.dump(self.embeddings, f)
+                remove_mapped_index(self.vector_store_path)
+            
+            # Guardar chunks (almacén compacto)
+            self.chunks.save(self.vector_store_path)
+            legacy_chunks_path = os.path.join(self.vector_store_path, "chunks.pkl")
+            if os.path.exists(legacy_chunks_path):
+                os.remove(legacy_chunks_path)
             
-            # Guardar chunks
-            with open(os.path.join(self.vector_store_path, "chunks.pkl"), "wb") as f:
-                pickle.dump(self.chunks, f)
+            # Guardar metadatos de chunks (tabla columnar)
+            self.metadata.save(self.vector_store_path)
             
             print("Vector store guardado exitosamente")
     
     def load_vector_store(self) -> bool:
-        """Carga el vector store desde disco"""
+        """Carga el vector store desde disco (nunca a medio escribir)"""
+        with self.store_writer.lock:
+            self._store_generation = self.store_writer.generation
+            return self._load_vector_store()
+    
+    def _sync_with_store(self):
+        """Recarga el store si otra instancia lo guardó después (con el lock tomado)"""
+        if self._store_generation != self.store_writer.generation:
+            print("🔄 El vector store cambió en disco, recargando antes de modificarlo")
+            self.load_vector_store()
+    
+    def _load_vector_store(self) -> bool:
         try:
             vectorizer_path = os.path.join(self.vector_store_path, "vectorizer.pkl")
             embeddings_path = os.path.join(self.vector_store_path, "embeddings.pkl")
-            chunks_path = os.path.join(self.vector_store_path, "chunks.pkl")
+            legacy_chunks_path = os.path.join(self.vector_store_path, "chunks.pkl")
+            has_chunks = (CompactChunkStore.exists(self.vector_store_path) or
+                          os.path.exists(legacy_chunks_path))
+            
+            has_embeddings = (os.path.exists(embeddings_path) or
+                              mapped_index_exists(self.vector_store_path))
             
-            if all(os.path.exists(p) for p in [vectorizer_path, embeddings_path, chunks_path]):
+            if has_chunks and has_embeddings and os.path.exists(vectorizer_path):
                 with open(vectorizer_path, "rb") as f:
-                    self.vectorizer = pickle.load(f)
+                    vectorizer = pickle.load(f)
+                
+                if mapped_index_exists(self.vector_store_path):
+                    # Índice construido fuera de memoria: se mapea, no se lee entero
+                    embeddings = load_mapped_index(self.vector_store_path)
+                else:
+                    with open(embeddings_path, "rb") as f:
+                        embeddings = pickle.load(f)
                 
-                with open(embeddings_path, "rb") as f:
-                    self.embeddings = pickle.load(f)
+                if CompactChunkStore.exists(self.vector_store_path):
+                    # Fuera de memoria el texto también se mapea: se lee del disco por lotes al indexar
+                    chunks = CompactChunkStore.load(
+                        self.vector_store_path,
+                        mapped=self.index_build_mode == "out_of_core"
+                    )
+                else:
+                    # Vector store antiguo: lista de tuplas (texto, página)
+                    with open(legacy_chunks_path, "rb") as f:
+                        chunks = CompactChunkStore.from_chunks(pickle.load(f))
                 
-                with open(chunks_path, "rb") as f:
-                    self.chunks = pickle.load(f)
+                # Vector stores antiguos no tienen metadatos: un único documento
+                metadata = ChunkMetadataTable.load(self.vector_store_path)
+                if metadata is None or len(metadata) != len(chunks):
+                    metadata = ChunkMetadataTable.for_chunks(chunks.pages)
+                self._install_index(vectorizer, embeddings, chunks, metadata)
                 
                 print(f"Vector store cargado: {len(self.chunks)} chunks")
                 return True
             return False
+        except ChunkStoreCodecError:
+            # No se puede tratar como vacío: la siguiente subida sobrescribiría el vector store
+            raise
         except Exception as e:
             print(f"Error cargando vector store: {e}")
             return False
     
-    def search_similar_chunks(self, query: str, top_k: int = 3) -> List[Tuple[str, int, float]]:
-        """Busca chunks similares usando cosine similarity"""
-        if self.embeddings is None or self.vectorizer is None:
+    def memory_usage(self) -> int:
+        """Estima los bytes que ocupa el vector store cargado en memoria"""
+        total = self.chunks.memory_usage()
+        if self.embeddings is not None and not is_mapped(self.embeddings):
+            total += (self.embeddings.data.nbytes +
+                      self.embeddings.indices.nbytes +
+                      self.embeddings.indptr.nbytes)
+        if self.vectorizer is not None:
+            total += 100 * len(getattr(self.vectorizer, "vocabulary_", {}))
+        return total + self.metadata.memory_usage()
+    
+    def warm_up(self) -> bool:
+        """Precalienta el vector store cargado.
+        
+        Recorre los arrays de embeddings y chunks para traerlos a memoria y
+        ejecuta una consulta sintética que importa sklearn e inicializa sus
+        cachés. Devuelve False si no hay vector store que precalentar.
+        """
+        if self.embeddings is None or len(self.chunks) == 0:
+            return False
+        
+        float(self.embeddings.data.sum())
+        int(self.embeddings.indices.sum())
+        self.chunks.get_text(0)
+        self.search_similar_chunks("warmup", top_k=1)
+        return True
+    
+    def _candidate_embeddings(self, filters=None, snapshot: Optional[IndexSnapshot] = None):
+        """Devuelve (índices candidatos, matriz de candidatos) según los filtros.
+
+        Sin filtros los candidatos son None y se usa la matriz completa; si
+        ningún chunk cumple los filtros la matriz devuelta es None.
+        """
+        snapshot = snapshot or self.snapshot()
+        if snapshot.embeddings is None or snapshot.vectorizer is None:
             raise ValueError("Vector store no inicializado")
+
+        mask = snapshot.metadata.build_mask(filters)
+        if mask is None:
+            return None, snapshot.embeddings
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return candidates, None
+        return candidates, snapshot.embeddings[candidates]
+
+    def search_chunk_indices(self, query: str, top_k: int = 3, filters=None,
+                             snapshot: Optional[IndexSnapshot] = None) -> List[Tuple[int, float]]:
+        """Busca los índices de los chunks más similares a la query.
         
+        Si hay filtros, la máscara de candidatos (metadatos) se aplica antes de
+        calcular similitudes, de modo que solo se puntúan los chunks que pueden
+        aparecer en el resultado. Los índices devueltos se refieren a los chunks
+        de `snapshot` (por defecto, el índice instalado al empezar).
+        """
+        snapshot = snapshot or self.snapshot()
+        candidates, candidate_embeddings = self._candidate_embeddings(filters, snapshot)
+        if candidate_embeddings is None:
+            return []
+
         # Vectorizar query
-        query_vector = self.vectorizer.transform([query])
+        query_vector = snapshot.vectorizer.transform([query])
         
-        # Calcular similitudes usando cosine similarity
-        similarities = cosine_similarity(query_vector, self.embeddings).flatten()
+        # Calcular similitudes: las filas ya están normalizadas (L2), así que el
+        # producto escalar es la similitud coseno y no hay que copiar la matriz
+        query_vector = query_vector.astype(candidate_embeddings.dtype)
+        similarities = candidate_embeddings.dot(query_vector.T).toarray().ravel()
         
         # Obtener top_k resultados
-        top_indices = similarities.argsort()[-top_k:][::-1]
+        top_positions = similarities.argsort()[-top_k:][::-1]
         
         results = []
-        for idx in top_indices:
-            if idx < len(self.chunks):
-                chunk_text, page_num = self.chunks[idx]
-                similarity_score = float(similarities[idx])
-                results.append((chunk_text, page_num, similarity_score))
+        for position in top_positions:
+            idx = int(position if candidates is None else candidates[position])
+            if idx < len(snapshot.chunks):
+                results.append((idx, float(similarities[position])))
         
         return results
     
-    def process_document(self, file_path: str):
-        """Procesa un documento completo"""
-        print(f"Procesando documento: {file_path}")
+    def best_matching_sentence(self, query: str, text: str) -> Tuple[str, float]:
+        """Devuelve la frase de un texto más similar a la query en el espacio del índice"""
+        sentences = [" ".join(sentence.split()) for sentence in SENTENCE_SPLIT.split(text)]
+        sentences = [sentence for sentence in sentences if sentence]
+        if not sentences or self.vectorizer is None:
+            return "", 0.0
         
-        # Extraer texto según el tipo de archivo
-        text_chunks = self.extract_text_from_document(file_path)
-        print(f"Extraídos {len(text_chunks)} chunks de texto")
+        vectors = self.vectorizer.transform([query] + sentences)
+        scores = vectors[1:].dot(vectors[0].T).toarray().ravel()
+        best = int(scores.argmax())
+        return sentences[best], float(scores[best])
+    
+    def highlight_terms(self, query: str, text: str) -> List[Tuple[int, int, str]]:
+        """Rangos (inicio, fin, término) del texto que coinciden con términos de la query
         
-        # Crear embeddings
-        self.create_embeddings(text_chunks)
+        Los términos se obtienen con la misma tokenización que el índice
+        (minúsculas, sin stop words), así que marcan lo que ha puntuado.
+        """
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
         
-        # Guardar vector store
-        self.save_vector_store()
+        terms = {token.lower() for token in TOKEN_PATTERN.findall(query)} - ENGLISH_STOP_WORDS
+        if not terms:
+            return []
+        return [
+            (match.start(), match.end(), match.group().lower())
+            for match in TOKEN_PATTERN.finditer(text)
+            if match.group().lower() in terms
+        ]
+    
+    def search_similar_chunks(self, query: str, top_k: int = 3,
+                              filters=None) -> List[Tuple[str, int, float]]:
+        """Busca chunks similares usando cosine similarity"""
+        snapshot = self.snapshot()
+        results = []
+        for idx, similarity_score in self.search_chunk_indices(query, top_k, filters, snapshot):
+            chunk_text, page_num = snapshot.chunks[idx]
+            results.append((chunk_text, page_num, similarity_score))
+        
+        return results
+    
+    def search_chunk_indices_batch(self, queries: List[str], top_k: int = 3, filters=None,
+                                   snapshot: Optional[IndexSnapshot] = None) -> List[List[Tuple[int, float]]]:
+        """Busca los chunks más similares para varias queries en una sola pasada.
+
+        Las queries se vectorizan juntas y se puntúan con un único producto de
+        matrices dispersas (chunks x queries); después se extrae el top_k de
+        cada columna. Todas las queries comparten los mismos filtros.
+        """
+        if not queries:
+            return []
+        snapshot = snapshot or self.snapshot()
+        candidates, candidate_embeddings = self._candidate_embeddings(filters, snapshot)
+        if candidate_embeddings is None:
+            return [[] for _ in queries]
+
+        query_matrix = snapshot.vectorizer.transform(queries).astype(candidate_embeddings.dtype)
+        scores = candidate_embeddings.dot(query_matrix.T).tocsc()
+        n_candidates = candidate_embeddings.shape[0]
+
+        batch_results = []
+        for column in range(len(queries)):
+            start, end = scores.indptr[column], scores.indptr[column + 1]
+            positions, similarities = _top_k_positions(
+                scores.indices[start:end], scores.data[start:end], top_k, n_candidates
+            )
+            results = []
+            for position, similarity in zip(positions, similarities):
+                idx = int(position if candidates is None else candidates[position])
+                if idx < len(snapshot.chunks):
+                    results.append((idx, float(similarity)))
+            batch_results.append(results)
+
+        return batch_results
+
+    def search_similar_chunks_batch(self, queries: List[str], top_k: int = 3,
+                                    filters=None) -> List[List[Tuple[str, int, float]]]:
+        """Versión por lotes de search_similar_chunks (una lista de resultados por query)"""
+        snapshot = self.snapshot()
+        return [
+            [(*snapshot.chunks[idx], similarity_score) for idx, similarity_score in results]
+            for results in self.search_chunk_indices_batch(queries, top_k, filters, snapshot)
+        ]
+
+    def process_document(self, file_path: str, tags: Optional[List[str]] = None):
+        """Procesa un documento y lo agrega al vector store"""
+        self.process_documents([file_path], tags=tags)
+        print("Documento procesado exitosamente")
+    
+    def process_documents(self, file_paths: List[str], tags: Optional[List[str]] = None):
+        """Procesa varios documentos y reconstruye el índice una sola vez
+        
+        La extracción se hace sin bloquear; copiar el estado, reconstruir,
+        instalar y guardar se serializa con el StoreWriter del store para que
+        dos subidas concurrentes no se pierdan la una a la otra.
+        """
+        extracted = []
+        for file_path in file_paths:
+            print(f"Procesando documento: {file_path}")
+            
+            # Extraer texto según el tipo de archivo
+            document_id = self.compute_document_id(file_path)
+            text, spans = self.extract_spans_from_document(file_path, document_id)
+            print(f"Extraídos {len(spans)} chunks de texto")
+            extracted.append((file_path, document_id, text, spans))
+        
+        with self.store_writer.lock:
+            self._sync_with_store()
+            metadata = copy.deepcopy(self.metadata)
+            chunks = self.chunks.copy()
+            
+            for file_path, document_id, text, spans in extracted:
+                # Reemplazar versiones anteriores del mismo documento
+                if metadata.has_document(document_id):
+                    keep = metadata.remove_document(document_id)
+                    chunks = chunks.filter(keep)
+                
+                # El texto del documento se guarda una sola vez; los chunks son rangos
+                chunks.add_document(text, spans)
+                metadata.add_document(
+                    document_id,
+                    os.path.abspath(file_path),
+                    [page for _, _, page in spans],
+                    tags=tags
+                )
+            
+            # Crear embeddings
+            self.create_embeddings(chunks, metadata)
+            
+            # Guardar vector store
+            self.save_vector_store()
+    
+    def rebuild_index(self):
+        """Vuelve a trocear e indexar todos los documentos con la configuración actual
         
-        print("Documento procesado exitosamente")
\ No newline at end of file
+        El texto se lee de la caché de extracción (o del archivo original si no
+        está en caché), por lo que cambiar CHUNK_SIZE/CHUNK_OVERLAP solo cuesta
+        tokenizar y ajustar el vectorizer. Los documentos que no se pueden
+        reconstruir (vector stores antiguos o archivos borrados sin caché)
+        conservan sus chunks actuales.
+        """
+        with self.store_writer.lock:
+            self._sync_with_store()
+            self._rebuild_index()
+    
+    def _rebuild_index(self):
+        print(f"Reconstruyendo índice (chunk_size={self.chunk_size}, overlap={self.chunk_overlap})")
+        metadata = copy.deepcopy(self.metadata)
+        rebuilt = []
+        
+        for index, document in enumerate(self.metadata.documents):
+            document_id = document["document_id"]
+            source = document["source"]
+            # Los documentos legacy no tienen id de contenido (ni entrada en la caché)
+            cached = (document_id != LEGACY_DOCUMENT_ID and self.extraction_cache is not None
+                      and self.extraction_cache.has(document_id))
+            if document_id == LEGACY_DOCUMENT_ID or not (cached or os.path.exists(source)):
+                print(f"⚠️  No se puede reconstruir {source or document_id}, se conservan sus chunks")
+                continue
+            text, spans = self.extract_spans_from_document(source, document_id)
+            rebuilt.append((index, document, text, spans))
+        
+        rebuilt_indices = [index for index, _, _, _ in rebuilt]
+        chunks = self.chunks.filter(~np.isin(metadata.doc_index, rebuilt_indices))
+        for _, document, _, _ in rebuilt:
+            metadata.remove_document(document["document_id"])
+        
+        for _, document, text, spans in rebuilt:
+            chunks.add_document(text, spans)
+            metadata.add_document(
+                document["document_id"],
+                document["source"],
+                [page for _, _, page in spans],
+                tags=document["tags"],
+                uploaded_at=document["uploaded_at"]
+            )
+        
+        self.create_embeddings(chunks, metadata)
+        self.save_vector_store()
+        print(f"Índice reconstruido: {len(rebuilt)} documentos, {len(chunks)} chunks")
@@ -0,0 +1,98 @@
+import os
+import re
+import struct
+import tempfile
+from typing import List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+KEY_PATTERN = re.compile(r"^[0-9a-f]{8,64}$")
+
+class PageExtractionCache:
+    """Caché en disco del texto extraído por página, indexada por hash de contenido.
+
+    Cada documento se guarda en un archivo binario con prefijos de longitud:
+
+        b"RPC1" | uint32 páginas | uint64 offsets[páginas + 1] | texto UTF-8
+
+    La tabla de offsets permite leer una página concreta sin leer el resto.
+    Como la clave es el hash del contenido, volver a trocear o re-indexar no
+    necesita volver a abrir los PDFs con PyMuPDF.
+    """
+
+    MAGIC = b"RPC1"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv(
+            "EXTRACTION_CACHE_PATH",
+            os.path.join(os.getenv("VECTOR_STORE_PATH", "./vector_store"), "extraction_cache")
+        )
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        if not KEY_PATTERN.match(key):
+            raise ValueError(f"Clave de caché inválida: {key}")
+        return os.path.join(self.path, f"{key}.pages")
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._file(key))
+
+    def put_pages(self, key: str, pages: List[str]):
+        """Guarda las páginas de un documento (escritura atómica)"""
+        encoded = [page.encode("utf-8") for page in pages]
+        offsets = [0]
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+
+        target = self._file(key)
+        # Temporal único: el mismo contenido puede subirse a la vez a dos colecciones
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=f"{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.MAGIC)
+                f.write(struct.pack("<I", len(encoded)))
+                f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+                for data in encoded:
+                    f.write(data)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _read_header(self, f):
+        if f.read(4) != self.MAGIC:
+            raise ValueError("Archivo de caché corrupto")
+        (count,) = struct.unpack("<I", f.read(4))
+        offsets = struct.unpack(f"<{count + 1}Q", f.read(8 * (count + 1)))
+        return count, offsets, f.tell()
+
+    def get_pages(self, key: str) -> Optional[List[str]]:
+        """Devuelve todas las páginas de un documento o None si no está en caché"""
+        path = self._file(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                count, offsets, _ = self._read_header(f)
+                data = f.read()
+        except (OSError, ValueError, struct.error) as e:
+            print(f"⚠️  Caché de extracción ilegible ({key}): {e}")
+            return None
+        return [
+            data[offsets[i]:offsets[i + 1]].decode("utf-8")
+            for i in range(count)
+        ]
+
+    def get_page(self, key: str, page_number: int) -> Optional[str]:
+        """Devuelve una página (numerada desde 1) leyendo solo sus bytes"""
+        path = self._file(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            count, offsets, data_start = self._read_header(f)
+            if not 1 <= page_number <= count:
+                return None
+            f.seek(data_start + offsets[page_number - 1])
+            return f.read(offsets[page_number] - offsets[page_number - 1]).decode("utf-8")
@@ -0,0 +1,172 @@
+import os
+import json
+import shutil
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+INDEX_INFO_FILE = "index_info.json"
+INDEX_ARRAYS = ("data", "indices", "indptr")
+
+class HashedTfidfVectorizer:
+    """TF-IDF sobre un espacio de features hasheado (estable, sin vocabulario).
+
+    Al no depender de un vocabulario aprendido, los lotes pueden vectorizarse
+    por separado y combinarse después; solo el IDF necesita una pasada previa
+    sobre las frecuencias de documento. Expone transform() como TfidfVectorizer.
+    """
+
+    def __init__(self, n_features: Optional[int] = None):
+        self.n_features = n_features or int(os.getenv("INDEX_HASH_FEATURES", 2 ** 20))
+        self.idf_: Optional[np.ndarray] = None
+        self._hasher = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_hasher"] = None
+        return state
+
+    def term_counts(self, texts: Iterable[str]) -> "sparse.csr_matrix":
+        """Cuenta términos (unigramas y bigramas) de cada texto en el espacio hasheado"""
+        if self._hasher is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+            # Mismo análisis que el TfidfVectorizer del modo en memoria
+            self._hasher = HashingVectorizer(
+                n_features=self.n_features,
+                alternate_sign=False,
+                norm=None,
+                stop_words='english',
+                ngram_range=(1, 2),
+                dtype=np.float32
+            )
+        counts = self._hasher.transform(texts).tocsr()
+        counts.sum_duplicates()
+        return counts
+
+    def weight(self, counts: "sparse.csr_matrix") -> "sparse.csr_matrix":
+        """Aplica el IDF y normaliza cada fila (L2) sobre una matriz de conteos"""
+        from sklearn.preprocessing import normalize
+
+        weighted = counts.astype(np.float32, copy=True)
+        weighted.data *= self.idf_[weighted.indices]
+        return normalize(weighted, norm="l2", copy=False)
+
+    def transform(self, texts: Iterable[str]) -> "sparse.csr_matrix":
+        if self.idf_ is None:
+            raise ValueError("El vectorizer hasheado no tiene IDF calculado")
+        return self.weight(self.term_counts(texts))
+
+class OutOfCoreIndexBuilder:
+    """Construye el índice TF-IDF por lotes sin tener todo el corpus en memoria.
+
+    Cada lote se vectoriza a conteos hasheados y se vuelca a disco como un
+    segmento CSR, acumulando las frecuencias de documento. Al finalizar se
+    calcula el IDF y los segmentos se fusionan, ponderados y normalizados, en
+    arrays .npy que se cargan con mmap, por lo que la matriz final tampoco
+    tiene que caber en memoria.
+    """
+
+    def __init__(self, output_path: str, n_features: Optional[int] = None):
+        self.output_path = output_path
+        self.segments_path = os.path.join(output_path, "index_segments")
+        self.vectorizer = HashedTfidfVectorizer(n_features)
+        self.document_frequency = np.zeros(self.vectorizer.n_features, dtype=np.int64)
+        self.segments: List[str] = []
+        self.n_rows = 0
+        self.nnz = 0
+
+        shutil.rmtree(self.segments_path, ignore_errors=True)
+        os.makedirs(self.segments_path, exist_ok=True)
+
+    def add_batch(self, texts: List[str]):
+        """Vectoriza un lote y lo vuelca a disco como segmento"""
+        counts = self.vectorizer.term_counts(texts)
+        self.document_frequency += np.bincount(counts.indices, minlength=self.vectorizer.n_features)
+
+        from scipy import sparse  # importación diferida: scipy no se carga al arrancar la app
+
+        segment = os.path.join(self.segments_path, f"segment_{len(self.segments):05d}.npz")
+        sparse.save_npz(segment, counts, compressed=False)
+        self.segments.append(segment)
+        self.n_rows += counts.shape[0]
+        self.nnz += counts.nnz
+
+    def finalize(self) -> Tuple[HashedTfidfVectorizer, "sparse.csr_matrix"]:
+        """Calcula el IDF, fusiona los segmentos en el store y devuelve vectorizer y matriz"""
+        from scipy import sparse
+
+        # Mismo IDF suavizado que TfidfTransformer
+        self.vectorizer.idf_ = (
+            np.log((1 + self.n_rows) / (1 + self.document_frequency)) + 1
+        ).astype(np.float32)
+
+        index_dtype = np.int32 if self.nnz < np.iinfo(np.int32).max else np.int64
+        tmp_paths = {name: os.path.join(self.output_path, f"embeddings_{name}.tmp.npy")
+                     for name in INDEX_ARRAYS}
+        data = np.lib.format.open_memmap(tmp_paths["data"], mode="w+", dtype=np.float32, shape=(self.nnz,))
+        indices = np.lib.format.open_memmap(tmp_paths["indices"], mode="w+", dtype=index_dtype, shape=(self.nnz,))
+        indptr = np.lib.format.open_memmap(tmp_paths["indptr"], mode="w+", dtype=index_dtype, shape=(self.n_rows + 1,))
+
+        indptr[0] = 0
+        row = 0
+        position = 0
+        for segment in self.segments:
+            weighted = self.vectorizer.weight(sparse.load_npz(segment).tocsr())
+            rows, nnz = weighted.shape[0], weighted.nnz
+            data[position:position + nnz] = weighted.data
+            indices[position:position + nnz] = weighted.indices
+            indptr[row + 1:row + rows + 1] = weighted.indptr[1:].astype(index_dtype) + position
+            row += rows
+            position += nnz
+
+        for array in (data, indices, indptr):
+            array.flush()
+        del data, indices, indptr
+
+        # Reemplazo atómico de los arrays; un índice mapeado previamente sigue siendo válido
+        for name, tmp_path in tmp_paths.items():
+            os.replace(tmp_path, os.path.join(self.output_path, f"embeddings_{name}.npy"))
+        with open(os.path.join(self.output_path, INDEX_INFO_FILE), "w") as f:
+            json.dump({"shape": [self.n_rows, self.vectorizer.n_features]}, f)
+        shutil.rmtree(self.segments_path, ignore_errors=True)
+
+        return self.vectorizer, load_mapped_index(self.output_path)
+
+def mapped_index_exists(path: str) -> bool:
+    return os.path.exists(os.path.join(path, INDEX_INFO_FILE))
+
+def load_mapped_index(path: str) -> "sparse.csr_matrix":
+    """Carga la matriz del índice con mmap (las páginas se leen bajo demanda)"""
+    from scipy import sparse
+
+    with open(os.path.join(path, INDEX_INFO_FILE)) as f:
+        shape = tuple(json.load(f)["shape"])
+    arrays = [
+        np.load(os.path.join(path, f"embeddings_{name}.npy"), mmap_mode="r")
+        for name in INDEX_ARRAYS
+    ]
+    return sparse.csr_matrix(tuple(arrays), shape=shape, copy=False)
+
+def remove_mapped_index(path: str):
+    """Elimina los arrays de un índice construido fuera de memoria"""
+    for name in INDEX_ARRAYS:
+        array_path = os.path.join(path, f"embeddings_{name}.npy")
+        if os.path.exists(array_path):
+            os.remove(array_path)
+    info_path = os.path.join(path, INDEX_INFO_FILE)
+    if os.path.exists(info_path):
+        os.remove(info_path)
+
+def is_mapped(matrix) -> bool:
+    """Indica si los datos de una matriz dispersa están respaldados por mmap"""
+    array = getattr(matrix, "data", None)
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, "base", None)
+    return False
@@ -1,46 +1,117 @@
 import os
 import time
-from typing import List, Dict, Any
-from .document_processor import DocumentProcessor
+from typing import List, Dict, Any, Awaitable, Callable, Optional, Tuple
+from .document_processor import DocumentProcessor, StoreWriter
 from .claude_client import ClaudeClient
-from ..models.schemas import DocumentChunk, RAGResponse
+from .request_coalescer import RequestCoalescer, normalize_question
+from .retrieval_batcher import RetrievalBatcher
+from .retrieval_cache import RetrievalCache
+from ..models.schemas import (
+    DocumentChunk, RAGResponse, SearchFilters,
+    SearchHighlight, SearchResponse, SearchResult
+)
 from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class RAGService:
-    def __init__(self):
-        self.document_processor = DocumentProcessor()
-        self.claude_client = ClaudeClient()
+    def __init__(self, vector_store_path: Optional[str] = None,
+                 claude_client: Optional[ClaudeClient] = None,
+                 store_writer: Optional[StoreWriter] = None):
+        self.document_processor = DocumentProcessor(vector_store_path, store_writer)
+        self.claude_client = claude_client or ClaudeClient()
         self.top_k = int(os.getenv("TOP_K_RESULTS", 3))
+        self.coalesce_requests = os.getenv("COALESCE_REQUESTS", "true").lower() in ("1", "true", "yes", "on")
+        self.coalescer = RequestCoalescer()
+        # Micro-batching de búsquedas concurrentes (RETRIEVAL_BATCH_WINDOW_MS=0 lo desactiva)
+        self.retrieval_batcher = RetrievalBatcher()
+        # Rankings de /search, invalidados al cambiar el índice
+        self.search_cache = RetrievalCache()
+        
+        # Enrutado por confianza de la recuperación
+        self.no_answer_threshold = float(os.getenv("NO_ANSWER_SCORE_THRESHOLD", 0.05))
+        self.extractive_threshold = float(os.getenv("EXTRACTIVE_SCORE_THRESHOLD", 0.5))
+        self.extractive_margin = float(os.getenv("EXTRACTIVE_SCORE_MARGIN", 0.15))
+        self.extractive_max_question_words = int(os.getenv("EXTRACTIVE_MAX_QUESTION_WORDS", 15))
+        self.min_tokens = int(os.getenv("CLAUDE_MIN_TOKENS", 256))
+        self.max_tokens = int(os.getenv("CLAUDE_MAX_TOKENS", 1000))
+        self.fast_model_max_tokens = int(os.getenv("CLAUDE_FAST_MODEL_MAX_TOKENS", 512))
         
         # Cargar vector store si existe
         if not self.document_processor.load_vector_store():
             print("No se encontró vector store existente. Necesita procesar documentos primero.")
     
-    async def answer_question(self, question: str) -> RAGResponse:
-        """Responde una pregunta usando RAG"""
+    async def answer_question(self, question: str,
+                              filters: Optional[SearchFilters] = None,
+                              allow_extractive: bool = False,
+                              admit: Optional[Callable[[Callable[[], Awaitable[RAGResponse]]],
+                                                       Awaitable[RAGResponse]]] = None) -> RAGResponse:
+        """Responde una pregunta usando RAG, opcionalmente restringida por metadatos.
+        
+        Las preguntas idénticas (normalizadas) que llegan mientras otra está en
+        curso contra la misma versión del índice comparten su resultado. `admit`
+        (p. ej. AdmissionController.run) envuelve solo el cálculo del líder: las
+        peticiones que se unen a un cálculo en curso no ocupan turno de admisión.
+        """
+        def compute():
+            if admit is None:
+                return self._answer_question(question, filters, allow_extractive)
+            return admit(lambda: self._answer_question(question, filters, allow_extractive))
+        
+        if not self.coalesce_requests:
+            return await compute()
+        
+        key = (
+            self.document_processor.index_version,
+            normalize_question(question),
+            filters.model_dump_json() if filters is not None else None,
+            allow_extractive
+        )
+        response = await self.coalescer.run(key, compute)
+        if response.question != question:
+            response = response.model_copy(update={"question": question})
+        return response
+    
+    def _is_extractive_candidate(self, question: str, scores: List[float]) -> bool:
+        """Pregunta corta con un resultado claramente mejor que el resto"""
+        second = scores[1] if len(scores) > 1 else 0.0
+        return (len(question.split()) <= self.extractive_max_question_words and
+                scores[0] >= self.extractive_threshold and
+                scores[0] - second >= self.extractive_margin)
+    
+    def _generation_budget(self, question: str, context: str) -> Tuple[int, bool]:
+        """max_tokens según el tamaño de pregunta y contexto, y si basta el modelo rápido"""
+        estimated = self.min_tokens + len(context) // 8 + 8 * len(question.split())
+        max_tokens = min(self.max_tokens, estimated)
+        return max_tokens, max_tokens <= self.fast_model_max_tokens
+    
+    async def _answer_question(self, question: str,
+                               filters: Optional[SearchFilters] = None,
+                               allow_extractive: bool = False) -> RAGResponse:
+        """Ejecuta búsqueda y generación para una pregunta"""
         start_time = time.time()
         
         try:
             # Buscar chunks relevantes
-            similar_chunks = self.document_processor.search_similar_chunks(
-                question, top_k=self.top_k
+            similar_chunks = await self.retrieval_batcher.search(
+                self.document_processor, question, self.top_k, filters
             )
             
+            if not similar_chunks and filters is not None:
+                # Los filtros no dejan ningún chunk: respuesta válida, sin llamar a Claude
+                return RAGResponse(
+                    question=question,
+                    answer="No hay documentos que cumplan los filtros indicados.",
+                    context_chunks=[],
+                    response_time=f"{time.time() - start_time:.2f}s",
+                    timestamp=datetime.utcnow(),
+                    route="no_answer"
+                )
+            
             if not similar_chunks:
                 raise ValueError("No se encontraron chunks relevantes para la pregunta")
             
-            # Preparar contexto
-            context = "\n\n".join([
-                f"[Página {page}] {chunk}" 
-                for chunk, page, score in similar_chunks
-            ])
-            
-            # Generar respuesta con Claude
-            answer = await self.claude_client.generate_response(context, question)
-            
             # Preparar chunks para respuesta
             context_chunks = [
                 DocumentChunk(
@@ -50,6 +121,36 @@ class RAGService:
                 )
                 for chunk, page, score in similar_chunks
             ]
+            scores = [score for _, _, score in similar_chunks]
+            route = "llm"
+            answer = None
+            
+            if scores[0] < self.no_answer_threshold:
+                # Nada relevante: responder sin llamar a Claude
+                route = "no_answer"
+                answer = "No encontré información sobre esta pregunta en los documentos."
+            elif allow_extractive and self._is_extractive_candidate(question, scores):
+                # Coincidencia clara: devolver la frase más relevante con su página
+                chunk, page, _ = similar_chunks[0]
+                sentence, sentence_score = self.document_processor.best_matching_sentence(question, chunk)
+                if sentence and sentence_score > 0:
+                    route = "extractive"
+                    answer = f"{sentence} (Página {page})"
+            
+            if answer is None:
+                # Preparar contexto
+                context = "\n\n".join([
+                    f"[Página {page}] {chunk}" 
+                    for chunk, page, score in similar_chunks
+                ])
+                
+                # Generar respuesta con Claude, con presupuesto según el tamaño
+                max_tokens, use_fast_model = self._generation_budget(question, context)
+                answer = await self.claude_client.generate_response(
+                    context, question,
+                    max_tokens=max_tokens,
+                    model=self.claude_client.fast_model if use_fast_model else None
+                )
             
             response_time = f"{time.time() - start_time:.2f}s"
             
@@ -58,15 +159,82 @@ class RAGService:
                 answer=answer,
                 context_chunks=context_chunks,
                 response_time=response_time,
-                timestamp=datetime.utcnow()
+                timestamp=datetime.utcnow(),
+                route=route
             )
             
         except Exception as e:
             raise Exception(f"Error en RAG Service: {str(e)}")
     
-    def process_new_document(self, file_path: str):
+    def search(self, query: str, top_k: Optional[int] = None, offset: int = 0,
+               filters: Optional[SearchFilters] = None) -> SearchResponse:
+        """Búsqueda de chunks sin generación: ranking paginado con metadatos y resaltado
+        
+        El ranking se calcula hasta la página siguiente y se guarda en caché,
+        así que repetir la búsqueda o avanzar una página no vuelve a puntuar.
+        Solo se devuelven chunks con algún término en común con la query.
+        """
+        start_time = time.time()
+        processor = self.document_processor
+        top_k = top_k or self.top_k
+        needed = offset + top_k + 1  # uno más para saber si hay más páginas
+        
+        # Ranking, textos y metadatos salen del mismo índice aunque se instale otro
+        snapshot = processor.snapshot()
+        key = (
+            normalize_question(query),
+            filters.model_dump_json() if filters is not None else None
+        )
+        ranking = self.search_cache.get(snapshot.version, snapshot.embeddings, key, needed)
+        cached = ranking is not None
+        if not cached:
+            depth = needed + top_k  # incluye la página siguiente
+            ranking = [
+                (idx, score)
+                for idx, score in processor.search_chunk_indices(
+                    query, top_k=depth, filters=filters, snapshot=snapshot
+                )
+                if score > 0
+            ]
+            # Un ranking del índice anterior no se cachea: vaciaría la caché del nuevo
+            if processor.index_version == snapshot.version:
+                self.search_cache.put(snapshot.version, snapshot.embeddings, key, depth, ranking)
+        
+        results = []
+        for rank, (idx, score) in enumerate(ranking[offset:offset + top_k], start=offset + 1):
+            content, page = snapshot.chunks[idx]
+            document = snapshot.metadata.document_for_chunk(idx)
+            results.append(SearchResult(
+                rank=rank,
+                content=content,
+                page=page,
+                similarity_score=score,
+                document_id=document["document_id"],
+                # Solo el nombre del archivo: no se exponen rutas del servidor
+                source=os.path.basename(document["source"]) or None,
+                highlights=[
+                    SearchHighlight(start=start, end=end, term=term)
+                    for start, end, term in processor.highlight_terms(query, content)
+                ]
+            ))
+        
+        return SearchResponse(
+            query=query,
+            results=results,
+            top_k=top_k,
+            offset=offset,
+            has_more=len(ranking) > offset + top_k,
+            cached=cached,
+            response_time=f"{time.time() - start_time:.3f}s"
+        )
+    
+    def process_new_document(self, file_path: str, tags: Optional[List[str]] = None):
         """Procesa un nuevo documento"""
-        return self.document_processor.process_document(file_path)
+        return self.document_processor.process_document(file_path, tags=tags)
+    
+    def process_new_documents(self, file_paths: List[str], tags: Optional[List[str]] = None):
+        """Procesa varios documentos reconstruyendo el índice una sola vez"""
+        return self.document_processor.process_documents(file_paths, tags=tags)
     
     def is_ready(self) -> bool:
         """Verifica si el servicio está listo para responder preguntas"""
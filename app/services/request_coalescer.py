@@ -0,0 +1,53 @@
+import asyncio
+import re
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+def normalize_question(question: str) -> str:
+    """Normaliza una pregunta para detectar duplicados (mayúsculas, espacios, signos)"""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" ¿?¡!.")
+
+class _Flight:
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+class RequestCoalescer:
+    """Single-flight: las llamadas concurrentes con la misma clave comparten un único cálculo.
+
+    La primera llamada lanza el cálculo como tarea; las siguientes con la misma
+    clave esperan esa misma tarea y reciben su resultado (o su excepción). Si
+    todos los que esperan se cancelan, el cálculo compartido también se cancela.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self.coalesced_requests = 0
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.coalesced_requests += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nadie espera ya el resultado: liberar el cálculo
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
@@ -0,0 +1,107 @@
+import asyncio
+import os
+from typing import Dict, Hashable, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class _PendingBatch:
+    def __init__(self, document_processor, top_k: int, filters):
+        self.document_processor = document_processor
+        self.top_k = top_k
+        self.filters = filters
+        self.queries: List[str] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+class RetrievalBatcher:
+    """Agrupa las búsquedas concurrentes en una única pasada de vectorización y puntuación.
+
+    La primera búsqueda abre un lote y programa su ejecución tras `window_ms`;
+    las que llegan mientras tanto con el mismo procesador, top_k y filtros se
+    añaden al lote, que se ejecuta antes si alcanza `max_batch_size`. El lote
+    se resuelve con search_similar_chunks_batch (un producto de matrices
+    dispersas) y cada coroutine recibe sus propios resultados.
+    Con una ventana de 0 ms cada búsqueda se ejecuta directamente.
+    """
+
+    def __init__(self, window_ms: Optional[float] = None,
+                 max_batch_size: Optional[int] = None):
+        self.window_ms = window_ms if window_ms is not None else float(os.getenv("RETRIEVAL_BATCH_WINDOW_MS", 2))
+        self.max_batch_size = max_batch_size or int(os.getenv("RETRIEVAL_BATCH_MAX_SIZE", 32))
+        self._pending: Dict[Hashable, _PendingBatch] = {}
+
+        self.batches = 0
+        self.batched_queries = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0 and self.max_batch_size > 1
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window_ms,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "batched_queries": self.batched_queries,
+            "avg_batch_size": round(self.batched_queries / self.batches, 2) if self.batches else 0.0
+        }
+
+    async def search(self, document_processor, query: str, top_k: int, filters=None):
+        """Devuelve los (texto, página, score) de la query, ejecutada dentro de un lote"""
+        if not self.enabled:
+            return document_processor.search_similar_chunks(query, top_k=top_k, filters=filters)
+
+        loop = asyncio.get_running_loop()
+        key = (
+            id(document_processor),
+            getattr(document_processor, "index_version", None),
+            top_k,
+            filters.model_dump_json() if filters is not None else None
+        )
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = _PendingBatch(document_processor, top_k, filters)
+            self._pending[key] = batch
+            batch.timer = loop.call_later(self.window_ms / 1000, self._flush, key, batch)
+
+        future = loop.create_future()
+        batch.queries.append(query)
+        batch.futures.append(future)
+        if len(batch.queries) >= self.max_batch_size:
+            batch.timer.cancel()
+            self._flush(key, batch)
+
+        return await future
+
+    def _flush(self, key: Hashable, batch: _PendingBatch):
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+
+        # Las coroutines canceladas mientras esperaban no se puntúan
+        live = [(query, future) for query, future in zip(batch.queries, batch.futures)
+                if not future.done()]
+        if not live:
+            return
+        queries = [query for query, _ in live]
+
+        try:
+            if len(queries) == 1:
+                results = [batch.document_processor.search_similar_chunks(
+                    queries[0], top_k=batch.top_k, filters=batch.filters
+                )]
+            else:
+                results = batch.document_processor.search_similar_chunks_batch(
+                    queries, top_k=batch.top_k, filters=batch.filters
+                )
+        except Exception as e:
+            for _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.batched_queries += len(queries)
+        for (_, future), result in zip(live, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,69 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class RetrievalCache:
+    """Caché LRU de rankings de búsqueda (índice de chunk, score), ligada a un índice concreto.
+
+    Cada entrada guarda el ranking hasta la profundidad con la que se calculó,
+    de modo que las páginas siguientes de la misma búsqueda se sirven sin volver
+    a puntuar. La caché pertenece a una versión del índice y a la matriz de
+    embeddings con la que se puntuó; si cambia cualquiera de las dos se vacía.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("SEARCH_CACHE_SIZE", 1024))
+        self._entries: "OrderedDict[Hashable, Tuple[int, List[Tuple[int, float]]]]" = OrderedDict()
+        self._index_version = None
+        self._matrix = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def _check_index(self, index_version: int, matrix):
+        if self._index_version != index_version or self._matrix is not matrix:
+            self._entries.clear()
+            self._index_version = index_version
+            self._matrix = matrix
+
+    def get(self, index_version: int, matrix, key: Hashable,
+            depth: int) -> Optional[List[Tuple[int, float]]]:
+        """Devuelve el ranking cacheado si cubre al menos `depth` posiciones"""
+        with self._lock:
+            self._check_index(index_version, matrix)
+            entry = self._entries.get(key)
+            # Un ranking más corto que su profundidad ya contiene todos los resultados
+            if entry is None or (entry[0] < depth and len(entry[1]) >= entry[0]):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, index_version: int, matrix, key: Hashable, depth: int,
+            ranking: List[Tuple[int, float]]):
+        """Guarda un ranking puntuado con `matrix` mientras el índice estaba en `index_version`"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._check_index(index_version, matrix)
+            self._entries[key] = (depth, ranking)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
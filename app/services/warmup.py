@@ -0,0 +1,84 @@
+import os
+import time
+import traceback
+from typing import List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def _env_flag(name: str, default: str = "true") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+class WarmupState:
+    """Estado del precalentamiento usado por el endpoint de readiness"""
+
+    def __init__(self):
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.collections: List[str] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def start(self, collections: List[str]):
+        self.status = "warming"
+        self.error = None
+        self.collections = list(collections)
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def finish(self):
+        self.status = "ready"
+        self.finished_at = time.time()
+
+    def fail(self, error: Exception):
+        self.status = "failed"
+        self.error = str(error)
+        self.finished_at = time.time()
+
+    def to_dict(self) -> dict:
+        duration = None
+        if self.started_at is not None and self.finished_at is not None:
+            duration = f"{self.finished_at - self.started_at:.2f}s"
+        return {
+            "status": self.status,
+            "collections": self.collections,
+            "duration": duration,
+            "error": self.error
+        }
+
+warmup_state = WarmupState()
+
+def warmup_enabled() -> bool:
+    return _env_flag("WARMUP_ON_STARTUP")
+
+def warmup_in_background() -> bool:
+    return _env_flag("WARMUP_BACKGROUND")
+
+def warmup_collections() -> List[str]:
+    value = os.getenv("WARMUP_COLLECTIONS", "default")
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+def warm_up_collections(manager, collections: List[str], state: WarmupState = warmup_state):
+    """Carga y precalienta las colecciones indicadas (bloqueante, pensado para un hilo)"""
+    state.start(collections)
+    print(f"🔥 Precalentando colecciones: {', '.join(collections)}")
+    try:
+        for collection in collections:
+            if not manager.exists(collection):
+                print(f"⚠️  Colección inexistente, nada que precalentar: {collection}")
+                continue
+            service = manager.get(collection)
+            if service.document_processor.warm_up():
+                print(f"✅ Colección precalentada: {collection}")
+            else:
+                print(f"⚠️  Colección sin vector store, nada que precalentar: {collection}")
+        state.finish()
+        print(f"✅ Precalentamiento completado en {state.to_dict()['duration']}")
+    except Exception as e:
+        print(f"❌ Error en precalentamiento: {e}")
+        print(f"Traceback: {traceback.format_exc()}")
+        state.fail(e)
@@ -35,9 +35,7 @@ async def initialize_system():
     # Procesar documentos si no existe vector store
     if not rag_service.is_ready():
         print(f"📄 Procesando {len(all_files)} documentos...")
-        for file in all_files:
-            print(f"   Procesando: {file.name}")
-            rag_service.process_new_document(str(file))
+        rag_service.process_new_documents([str(file) for file in all_files])
     
     print("✅ Sistema RAG listo para usar")
     print(f"📊 Total de chunks: {len(rag_service.document_processor.chunks)}")
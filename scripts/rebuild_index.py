@@ -0,0 +1,31 @@
+# scripts/rebuild_index.py
+import argparse
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.collection_manager import CollectionManager, DEFAULT_COLLECTION
+from app.services.document_processor import DocumentProcessor
+
+def rebuild_index(collection: str):
+    """Re-trocea y re-indexa una colección usando la caché de extracción"""
+    manager = CollectionManager()
+    if not manager.exists(collection):
+        print(f"⚠️  La colección '{collection}' no existe")
+        return
+    processor = DocumentProcessor(manager.collection_path(collection))
+    
+    if not processor.load_vector_store():
+        print(f"⚠️  La colección '{collection}' no tiene vector store")
+        return
+    
+    processor.rebuild_index()
+    print(f"✅ Colección '{collection}' reconstruida")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye el índice con la configuración de chunks actual")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    args = parser.parse_args()
+    rebuild_index(args.collection)
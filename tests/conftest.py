@@ -0,0 +1,6 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def isolated_extraction_cache(tmp_path, monkeypatch):
+    """La caché de extracción de cada test va a tmp_path, no al directorio del repo"""
+    monkeypatch.setenv("EXTRACTION_CACHE_PATH", str(tmp_path / "extraction_cache"))
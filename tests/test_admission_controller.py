@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from app.services.admission_controller import AdmissionController, AdmissionRejected, DeadlineExceeded
+
+class TestAdmissionController:
+    async def _work(self, seconds=0.05, result="ok"):
+        await asyncio.sleep(seconds)
+        return result
+    
+    @pytest.mark.asyncio
+    async def test_runs_within_capacity(self):
+        """Test ejecución directa cuando hay capacidad libre"""
+        controller = AdmissionController(max_concurrency=2, max_queue=2)
+        
+        result = await controller.run(lambda: self._work(0.01))
+        assert result == "ok"
+        assert controller.stats()["active"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_full(self):
+        """Test rechazo con 429 cuando la cola está llena"""
+        controller = AdmissionController(max_concurrency=1, max_queue=1, initial_service_time=0.01)
+        running = asyncio.ensure_future(controller.run(lambda: self._work(0.1)))
+        queued = asyncio.ensure_future(controller.run(lambda: self._work(0.1)))
+        await asyncio.sleep(0.01)
+        
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.run(lambda: self._work(0.1))
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.retry_after >= 1
+        
+        assert await running == "ok"
+        assert await queued == "ok"
+    
+    @pytest.mark.asyncio
+    async def test_rejects_when_estimated_wait_exceeds_deadline(self):
+        """Test rechazo temprano con 503 si no llegaría a tiempo"""
+        controller = AdmissionController(max_concurrency=1, max_queue=10, initial_service_time=5.0)
+        running = asyncio.ensure_future(controller.run(lambda: self._work(0.05)))
+        await asyncio.sleep(0.01)
+        
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.run(lambda: self._work(0.01), deadline_ms=100)
+        assert exc_info.value.status_code == 503
+        await running
+    
+    @pytest.mark.asyncio
+    async def test_high_priority_served_first(self):
+        """Test que la prioridad alta adelanta a la baja en la cola"""
+        controller = AdmissionController(max_concurrency=1, max_queue=10, initial_service_time=0.01)
+        order = []
+        
+        async def record(name):
+            order.append(name)
+            await asyncio.sleep(0.01)
+        
+        running = asyncio.ensure_future(controller.run(lambda: self._work(0.05)))
+        await asyncio.sleep(0.01)
+        low = asyncio.ensure_future(controller.run(lambda: record("low"), priority="low"))
+        await asyncio.sleep(0)
+        high = asyncio.ensure_future(controller.run(lambda: record("high"), priority="high"))
+        await asyncio.gather(running, low, high)
+        
+        assert order == ["high", "low"]
+    
+    @pytest.mark.asyncio
+    async def test_high_priority_displaces_low_when_full(self):
+        """Test que con la cola llena una petición prioritaria desplaza a una de baja prioridad"""
+        controller = AdmissionController(max_concurrency=1, max_queue=1, initial_service_time=0.01)
+        running = asyncio.ensure_future(controller.run(lambda: self._work(0.05)))
+        await asyncio.sleep(0.01)
+        low = asyncio.ensure_future(controller.run(lambda: self._work(0.01), priority="low"))
+        await asyncio.sleep(0)
+        high = asyncio.ensure_future(controller.run(lambda: self._work(0.01), priority="high"))
+        
+        with pytest.raises(AdmissionRejected):
+            await low
+        assert await high == "ok"
+        await running
+    
+    @pytest.mark.asyncio
+    async def test_deadline_cancels_work(self):
+        """Test que al expirar el deadline se cancela la tarea en curso"""
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        cancelled = asyncio.Event()
+        
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        
+        with pytest.raises(DeadlineExceeded):
+            await controller.run(slow, deadline_ms=50)
+        assert cancelled.is_set()
+        assert controller.stats()["active"] == 0
@@ -2,7 +2,9 @@ import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import Mock, AsyncMock, patch
 from app.main import app
-from app.models.schemas import RAGResponse, DocumentChunk
+from app.models.schemas import RAGResponse, DocumentChunk, SearchResponse, SearchResult
+from app.services.admission_controller import AdmissionRejected
+from app.services.collection_manager import CollectionManager
 from datetime import datetime
 
 client = TestClient(app)
@@ -79,6 +81,90 @@ class TestAPI:
         assert response.status_code == 503
         assert "no listo" in response.json()["detail"]
     
+    @patch('app.api.endpoints.warmup_state')
+    def test_readiness_while_warming(self, mock_warmup_state):
+        """Test readiness mientras el precalentamiento no ha terminado"""
+        mock_warmup_state.ready = False
+        mock_warmup_state.to_dict.return_value = {"status": "warming"}
+        
+        response = client.get("/api/v1/ready")
+        assert response.status_code == 503
+        assert response.json()["ready"] is False
+    
+    @patch('app.api.endpoints.warmup_state')
+    def test_readiness_ready(self, mock_warmup_state):
+        """Test readiness cuando el sistema está precalentado"""
+        mock_warmup_state.ready = True
+        mock_warmup_state.to_dict.return_value = {"status": "ready"}
+        
+        response = client.get("/api/v1/ready")
+        assert response.status_code == 200
+        assert response.json()["warmup"]["status"] == "ready"
+    
+    @patch('app.api.endpoints.get_admission_controller')
+    @patch('app.api.endpoints.get_rag_service')
+    def test_ask_question_rejected_by_admission(self, mock_get_rag_service, mock_get_admission):
+        """Test rechazo por sobrecarga con cabecera Retry-After"""
+        mock_get_rag_service.return_value.is_ready.return_value = True
+        async def answer_question(question, admit=None, **kwargs):
+            return await admit(AsyncMock())
+        mock_get_rag_service.return_value.answer_question = AsyncMock(side_effect=answer_question)
+        mock_get_admission.return_value.default_deadline_ms = 30000
+        mock_get_admission.return_value.run = AsyncMock(
+            side_effect=AdmissionRejected(503, "Servicio saturado", 2.5)
+        )
+        
+        response = client.post(
+            "/api/v1/ask",
+            json={"question": "¿Qué es Python?", "priority": "low", "deadline_ms": 1000}
+        )
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "3"
+    
+    @patch('app.api.endpoints.get_rag_service')
+    def test_search_does_not_call_claude(self, mock_get_rag_service):
+        """Test /search devuelve fragmentos sin pasar por la generación"""
+        mock_service = mock_get_rag_service.return_value
+        mock_service.is_ready.return_value = True
+        mock_service.search.return_value = SearchResponse(
+            query="Python",
+            results=[SearchResult(
+                rank=1, content="Python es un lenguaje", page=1, similarity_score=0.8,
+                document_id="abc123", source="python.txt", highlights=[]
+            )],
+            top_k=5,
+            offset=0,
+            has_more=False,
+            cached=False,
+            response_time="0.001s"
+        )
+        
+        response = client.post("/api/v1/search", json={"query": "Python", "top_k": 5})
+        
+        assert response.status_code == 200
+        assert response.json()["results"][0]["document_id"] == "abc123"
+        mock_service.search.assert_called_once_with("Python", top_k=5, offset=0, filters=None)
+        mock_service.answer_question.assert_not_called()
+    
+    @patch('app.api.endpoints.get_collection_manager')
+    def test_unknown_collection_returns_404(self, mock_get_manager, tmp_path):
+        """Test que las consultas a una colección inexistente no la crean"""
+        manager = CollectionManager(base_path=str(tmp_path), claude_client=Mock())
+        mock_get_manager.return_value = manager
+        
+        assert client.get("/api/v1/status", params={"collection": "nope"}).status_code == 404
+        assert client.get("/api/v1/documents", params={"collection": "nope"}).status_code == 404
+        assert client.post(
+            "/api/v1/search", json={"query": "Python", "collection": "nope"}
+        ).status_code == 404
+        assert client.post(
+            "/api/v1/ask", json={"question": "¿Qué es Python?", "collection": "nope"}
+        ).status_code == 404
+        
+        assert not (tmp_path / "collections").exists()
+        assert manager.loaded_collections() == []
+    
     def test_upload_document_invalid_file(self):
         """Test upload con archivo inválido"""
         response = client.post(
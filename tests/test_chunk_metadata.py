@@ -0,0 +1,61 @@
+import numpy as np
+from app.services.chunk_metadata import ChunkMetadataTable
+from app.models.schemas import SearchFilters
+
+class TestChunkMetadataTable:
+    def setup_method(self):
+        """Setup para cada test"""
+        self.table = ChunkMetadataTable()
+        self.table.add_document("python", "/docs/python.txt", [1, 2, 3], tags=["lenguajes"])
+        self.table.add_document("fastapi", "/docs/fastapi.txt", [1, 2], tags=["web", "python"])
+        self.table.add_document("sql", "/docs/sql.txt", [1] * 10, tags=["lenguajes", "datos"])
+
+    def _mask(self, **filters) -> list:
+        return np.flatnonzero(self.table.build_mask(SearchFilters(**filters))).tolist()
+
+    def test_document_ranges(self):
+        """Test que cada documento ocupa un rango contiguo de chunks"""
+        assert self.table.document_range(0) == (0, 3)
+        assert self.table.document_range(2) == (5, 15)
+        assert self._mask(document_ids=["fastapi"]) == [3, 4]
+        assert self._mask(sources=["sql.txt"]) == list(range(5, 15))
+
+    def test_tag_filters(self):
+        """Test filtros por tag y combinación con otros campos"""
+        assert self._mask(tags=["lenguajes"]) == [0, 1, 2] + list(range(5, 15))
+        assert self._mask(tags=["web", "datos"]) == [3, 4] + list(range(5, 15))
+        assert self._mask(tags=["lenguajes"], document_ids=["sql"]) == list(range(5, 15))
+        assert self._mask(tags=["desconocido"]) == []
+
+    def test_remove_document_updates_ranges_and_tags(self):
+        """Test que eliminar un documento desplaza los rangos y bitmaps siguientes"""
+        keep = self.table.remove_document("python")
+
+        assert keep.tolist() == [False] * 3 + [True] * 12
+        assert len(self.table) == 12
+        assert self.table.document_range(1) == (2, 12)
+        assert self._mask(tags=["lenguajes"]) == list(range(2, 12))
+        assert self._mask(tags=["web"]) == [0, 1]
+        assert self.table.document_for_chunk(2)["document_id"] == "sql"
+
+        self.table.remove_document("fastapi")
+        assert "web" not in self.table._tag_bitmaps
+
+    def test_tag_bitmaps_are_packed(self):
+        """Test que los bitmaps de tags ocupan un bit por chunk"""
+        self.table.add_document("grande", "/docs/grande.txt", [1] * 1000, tags=["lenguajes"])
+
+        assert self.table._tag_bitmaps["lenguajes"].nbytes == (len(self.table) + 7) // 8
+        # Los tags que no aparecen al final no crecen con los documentos nuevos
+        assert self.table._tag_bitmaps["web"].nbytes == 1
+
+    def test_save_and_load(self, tmp_path):
+        """Test que rangos y bitmaps se reconstruyen al cargar"""
+        self.table.save(str(tmp_path))
+        loaded = ChunkMetadataTable.load(str(tmp_path))
+
+        assert loaded.document_range(2) == (5, 15)
+        assert np.array_equal(
+            loaded.build_mask(SearchFilters(tags=["python"])),
+            self.table.build_mask(SearchFilters(tags=["python"]))
+        )
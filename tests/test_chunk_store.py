@@ -0,0 +1,92 @@
+import os
+import pytest
+from app.services import chunk_store
+from app.services.chunk_store import ChunkStoreCodecError, CompactChunkStore
+
+class TestCompactChunkStore:
+    def setup_method(self):
+        """Setup para cada test"""
+        self.text = "".join(f"Frase número {i}. " for i in range(500))
+        self.spans = [(start, min(start + 100, len(self.text)), start // 1000 + 1)
+                      for start in range(0, len(self.text), 80)]
+    
+    @pytest.mark.parametrize("codec", ["none", "zlib"])
+    def test_chunks_across_blocks(self, codec):
+        """Test reconstrucción de chunks que cruzan bloques"""
+        store = CompactChunkStore(codec=codec, block_size=256)
+        store.add_document(self.text, self.spans)
+        
+        assert len(store) == len(self.spans)
+        for index, (start, end, page) in enumerate(self.spans):
+            assert store[index] == (self.text[start:end], page)
+    
+    def test_compression_reduces_memory(self):
+        """Test que el texto con overlap se guarda una sola vez y comprimido"""
+        store = CompactChunkStore(codec="zlib")
+        store.add_document(self.text, self.spans)
+        
+        raw_size = sum(end - start for start, end, _ in self.spans)
+        assert store.memory_usage() < raw_size / 2
+    
+    def test_filter_drops_documents(self):
+        """Test filtrado de chunks y descarte de documentos sin chunks"""
+        store = CompactChunkStore.from_chunks([("Uno", 1), ("Dos", 2), ("Tres", 3)])
+        filtered = store.filter([True, False, True])
+        
+        assert list(filtered) == [("Uno", 1), ("Tres", 3)]
+        assert len(filtered._blocks) == 2
+    
+    def test_save_and_load(self, tmp_path):
+        """Test persistencia del almacén"""
+        store = CompactChunkStore(block_size=300)
+        store.add_document(self.text, self.spans)
+        store.add_document("Texto con acentos: árbol, canción", [(0, 33, 1)])
+        store.save(str(tmp_path))
+        
+        loaded = CompactChunkStore.load(str(tmp_path))
+        assert loaded.block_size == 300
+        assert list(loaded) == list(store)
+    
+    @pytest.mark.parametrize("codec", ["none", "zlib"])
+    def test_load_mapped(self, tmp_path, codec):
+        """Test carga con mmap: el texto se lee del disco y no cuenta como memoria"""
+        store = CompactChunkStore(codec=codec, block_size=300)
+        store.add_document(self.text, self.spans)
+        store.save(str(tmp_path))
+        
+        loaded = CompactChunkStore.load(str(tmp_path), mapped=True)
+        assert list(loaded) == list(store)
+        assert loaded.memory_usage() < store.memory_usage()
+        
+        # Guardar sobre el archivo mapeado no invalida el almacén cargado
+        updated = loaded.copy()
+        updated.add_document("Documento nuevo", [(0, 15, 1)])
+        updated.save(str(tmp_path))
+        assert list(loaded) == list(store)
+        assert list(CompactChunkStore.load(str(tmp_path), mapped=True)) == list(updated)
+    
+    def test_load_requires_saved_codec(self, tmp_path, monkeypatch):
+        """Test que un almacén zstd no se carga como zlib si falta zstandard"""
+        store = CompactChunkStore(codec="none")
+        store.add_document(self.text, self.spans)
+        store.codec = "zstd"  # simula un almacén guardado con zstd
+        store.save(str(tmp_path))
+        monkeypatch.setattr(chunk_store, "zstandard", None)
+        
+        with pytest.raises(ChunkStoreCodecError):
+            CompactChunkStore.load(str(tmp_path))
+        
+        # Un almacén nuevo sí puede caer a zlib
+        assert CompactChunkStore(codec="zstd").codec == "zlib"
+    
+    def test_concurrent_saves_do_not_collide(self, tmp_path):
+        """Test que varios hilos pueden guardar el mismo almacén a la vez"""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        store = CompactChunkStore(block_size=300)
+        store.add_document(self.text, self.spans)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: store.save(str(tmp_path)), range(32)))
+        
+        assert list(CompactChunkStore.load(str(tmp_path))) == list(store)
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
@@ -0,0 +1,154 @@
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+from app.services.collection_manager import CollectionManager, CollectionNotFoundError, DEFAULT_COLLECTION
+
+class TestCollectionManager:
+    def setup_method(self):
+        """Setup para cada test"""
+        self.claude_client = Mock()
+    
+    def _manager(self, tmp_path, max_memory_mb=512):
+        return CollectionManager(
+            base_path=str(tmp_path),
+            max_memory_mb=max_memory_mb,
+            claude_client=self.claude_client
+        )
+    
+    def test_collection_paths(self, tmp_path):
+        """Test rutas por colección"""
+        manager = self._manager(tmp_path)
+        
+        assert manager.collection_path(DEFAULT_COLLECTION) == str(tmp_path)
+        assert manager.collection_path("cliente-a").endswith("collections/cliente-a")
+    
+    def test_invalid_collection_name(self, tmp_path):
+        """Test validación de nombres de colección"""
+        manager = self._manager(tmp_path)
+        
+        with pytest.raises(ValueError):
+            manager.get("../otro")
+    
+    def test_lazy_loading(self, tmp_path):
+        """Test carga lazy y reutilización de colecciones"""
+        manager = self._manager(tmp_path)
+        assert manager.loaded_collections() == []
+        
+        service = manager.get("cliente-a", create=True)
+        assert manager.get("cliente-a") is service
+        assert service.claude_client is self.claude_client
+        assert manager.loaded_collections() == ["cliente-a"]
+    
+    def test_unknown_collection_is_not_created(self, tmp_path):
+        """Test que obtener una colección inexistente no la crea en disco"""
+        manager = self._manager(tmp_path)
+        
+        with pytest.raises(CollectionNotFoundError):
+            manager.get("nope")
+        
+        assert not manager.exists("nope")
+        assert manager.loaded_collections() == []
+        assert manager.available_collections() == [DEFAULT_COLLECTION]
+        assert manager.exists(DEFAULT_COLLECTION)
+    
+    def test_collections_are_isolated(self, tmp_path):
+        """Test que cada colección tiene su propio vector store"""
+        manager = self._manager(tmp_path)
+        
+        service_a = manager.get("cliente-a", create=True)
+        service_a.document_processor.create_embeddings([("Python es un lenguaje", 1)])
+        service_a.document_processor.save_vector_store()
+        
+        service_b = manager.get("cliente-b", create=True)
+        assert service_a.is_ready()
+        assert not service_b.is_ready()
+        assert manager.available_collections() == [DEFAULT_COLLECTION, "cliente-a", "cliente-b"]
+    
+    def test_lru_eviction(self, tmp_path):
+        """Test descarga de la colección menos usada al superar el presupuesto"""
+        manager = self._manager(tmp_path, max_memory_mb=0.001)
+        
+        for name in ["cliente-a", "cliente-b"]:
+            service = manager.get(name, create=True)
+            service.document_processor.create_embeddings([("Texto de prueba " * 50, 1)])
+            service.document_processor.save_vector_store()
+            manager.enforce_memory_budget(keep=name)
+        
+        assert manager.loaded_collections() == ["cliente-b"]
+        
+        # La colección descargada se recarga desde disco
+        reloaded = manager.get("cliente-a")
+        assert reloaded.is_ready()
+        assert manager.loaded_collections() == ["cliente-a"]
+    
+    def test_evicted_service_writes_are_not_lost(self, tmp_path):
+        """Test que un servicio descargado y su recarga comparten el lock de escritura"""
+        manager = self._manager(tmp_path)
+        old = manager.get("cliente-a", create=True)
+        manager.evict("cliente-a")
+        new = manager.get("cliente-a")
+        assert new.document_processor.store_writer is old.document_processor.store_writer
+        
+        # El servicio descargado termina una subida después de la recarga
+        first = tmp_path / "python.txt"
+        first.write_text("Python es un lenguaje de programación", encoding="utf-8")
+        old.document_processor.process_document(str(first))
+        
+        # La nueva instancia recarga el store antes de añadir su documento
+        second = tmp_path / "fastapi.txt"
+        second.write_text("FastAPI es un framework web", encoding="utf-8")
+        new.document_processor.process_document(str(second))
+        
+        assert len(new.document_processor.metadata.documents) == 2
+    
+    def test_loading_does_not_hold_manager_lock(self, tmp_path):
+        """Test que cargar una colección no bloquea a las demás y se carga una sola vez"""
+        manager = self._manager(tmp_path)
+        loaded = manager.get("cliente-b", create=True)
+        
+        started, release = threading.Event(), threading.Event()
+        constructed = []
+        def slow_service(**kwargs):
+            constructed.append(kwargs["vector_store_path"])
+            started.set()
+            release.wait(timeout=5)
+            service = Mock()
+            service.document_processor.memory_usage.return_value = 0
+            return service
+        
+        with patch("app.services.collection_manager.RAGService", side_effect=slow_service), \
+                ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(manager.get, "cliente-a", True)
+            assert started.wait(timeout=5)
+            second = executor.submit(manager.get, "cliente-a", True)
+            
+            # Mientras "cliente-a" carga, el resto del manager responde
+            assert manager.get("cliente-b") is loaded
+            assert manager.loaded_collections() == ["cliente-b"]
+            
+            release.set()
+            assert first.result(timeout=5) is second.result(timeout=5)
+        
+        assert len(constructed) == 1
+        assert manager.loaded_collections() == ["cliente-b", "cliente-a"]
+    
+    def test_loaded_collections_does_not_wait_for_lock(self, tmp_path):
+        """Test que listar las colecciones cargadas no espera al lock del manager"""
+        manager = self._manager(tmp_path)
+        manager.get("cliente-a", create=True)
+        
+        holding, release = threading.Event(), threading.Event()
+        def hold_lock():
+            with manager._lock:
+                holding.set()
+                release.wait(timeout=5)
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(hold_lock)
+            assert holding.wait(timeout=5)
+            try:
+                with ThreadPoolExecutor(max_workers=1) as reader:
+                    assert reader.submit(manager.loaded_collections).result(timeout=1) == ["cliente-a"]
+            finally:
+                release.set()
@@ -1,7 +1,12 @@
 import pytest
 import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from app.services.document_processor import DocumentProcessor
+from app.services.extraction_cache import PageExtractionCache
+from app.services.chunk_store import ChunkStoreCodecError, CompactChunkStore
+from app.models.schemas import SearchFilters
 
 class TestDocumentProcessor:
     def setup_method(self):
@@ -38,4 +43,181 @@ class TestDocumentProcessor:
         
         assert len(results) <= 2
         assert all(len(result) == 3 for result in results)  # (texto, pagina, score)
-        assert all(isinstance(result[2], float) for result in results)  # score es float
\ No newline at end of file
+        assert all(isinstance(result[2], float) for result in results)  # score es float
+    
+    def _process_txt(self, tmp_path, name, content, tags=None):
+        file_path = tmp_path / name
+        file_path.write_text(content, encoding="utf-8")
+        self.processor.process_document(str(file_path), tags=tags)
+        return self.processor.compute_document_id(str(file_path))
+    
+    def test_process_documents_accumulates_metadata(self, tmp_path):
+        """Test que cada documento se agrega al vector store con sus metadatos"""
+        self.processor.vector_store_path = str(tmp_path)
+        self._process_txt(tmp_path, "python.txt", "Python es un lenguaje de programación", ["lenguajes"])
+        self._process_txt(tmp_path, "fastapi.txt", "FastAPI es un framework web para Python", ["web"])
+        
+        assert len(self.processor.chunks) == 2
+        assert len(self.processor.metadata.documents) == 2
+        
+        # Reprocesar un documento no duplica sus chunks
+        self._process_txt(tmp_path, "python.txt", "Python es un lenguaje de programación", ["lenguajes"])
+        assert len(self.processor.chunks) == 2
+    
+    def test_search_with_filters(self, tmp_path):
+        """Test búsqueda restringida por documento y tags"""
+        self.processor.vector_store_path = str(tmp_path)
+        python_id = self._process_txt(tmp_path, "python.txt", "Python es un lenguaje de programación", ["lenguajes"])
+        self._process_txt(tmp_path, "fastapi.txt", "FastAPI es un framework web para Python", ["web"])
+        
+        results = self.processor.search_similar_chunks(
+            "Python", top_k=3, filters=SearchFilters(document_ids=[python_id])
+        )
+        assert [text for text, _, _ in results] == ["Python es un lenguaje de programación"]
+        
+        results = self.processor.search_similar_chunks(
+            "Python", top_k=3, filters=SearchFilters(tags=["web"])
+        )
+        assert [text for text, _, _ in results] == ["FastAPI es un framework web para Python"]
+        
+        results = self.processor.search_similar_chunks(
+            "Python", top_k=3, filters=SearchFilters(uploaded_after=datetime(2999, 1, 1))
+        )
+        assert results == []
+
+    def test_batch_search_matches_individual_search(self, tmp_path):
+        """Test que la búsqueda por lotes devuelve lo mismo que query a query"""
+        self.processor.vector_store_path = str(tmp_path)
+        self._process_txt(tmp_path, "python.txt", "Python es un lenguaje de programación", ["lenguajes"])
+        self._process_txt(tmp_path, "fastapi.txt", "FastAPI es un framework web para Python", ["web"])
+        self._process_txt(tmp_path, "sql.txt", "SQLAlchemy es un ORM para bases de datos", ["datos"])
+
+        queries = ["Python", "framework web", "bases de datos ORM"]
+        batch_results = self.processor.search_similar_chunks_batch(queries, top_k=2)
+
+        assert len(batch_results) == len(queries)
+        for query, results in zip(queries, batch_results):
+            individual = self.processor.search_similar_chunks(query, top_k=2)
+            assert len(results) == len(individual) == 2
+            assert results[0][0] == individual[0][0]
+            assert results[0][2] == pytest.approx(individual[0][2])
+
+        filtered = self.processor.search_similar_chunks_batch(
+            queries, top_k=3, filters=SearchFilters(tags=["web"])
+        )
+        assert [[text for text, _, _ in results] for results in filtered] == \
+            [["FastAPI es un framework web para Python"]] * 3
+
+    def test_metadata_persistence(self, tmp_path):
+        """Test que los metadatos se guardan y cargan con el vector store"""
+        self.processor.vector_store_path = str(tmp_path)
+        self._process_txt(tmp_path, "python.txt", "Python es un lenguaje de programación", ["lenguajes"])
+        
+        loaded = DocumentProcessor(str(tmp_path))
+        assert loaded.load_vector_store()
+        assert loaded.metadata.documents[0]["tags"] == ["lenguajes"]
+        assert len(loaded.metadata) == len(loaded.chunks)
+    
+    def test_concurrent_uploads_keep_every_document(self, tmp_path):
+        """Test que subidas concurrentes al mismo store no se pisan"""
+        self.processor.vector_store_path = str(tmp_path)
+        paths = []
+        for i in range(4):
+            file_path = tmp_path / f"doc{i}.txt"
+            file_path.write_text(f"Documento número {i} sobre tema{i}", encoding="utf-8")
+            paths.append(str(file_path))
+        
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(self.processor.process_document, paths))
+        
+        assert len(self.processor.metadata.documents) == 4
+        loaded = DocumentProcessor(str(tmp_path))
+        assert loaded.load_vector_store()
+        assert len(loaded.metadata.documents) == len(loaded.chunks) == 4
+    
+    def test_index_swapped_after_build(self):
+        """Test que durante la construcción se sigue viendo el índice anterior completo"""
+        self.processor.create_embeddings([("Texto de prueba 1", 1)])
+        old_chunks, old_embeddings = self.processor.chunks, self.processor.embeddings
+        old_version = self.processor.index_version
+        
+        new_chunks = CompactChunkStore.from_chunks([("Texto nuevo 1", 1), ("Texto nuevo 2", 2)])
+        observed = []
+        original_texts = new_chunks.texts
+        def texts():
+            observed.append((self.processor.index_version, self.processor.chunks,
+                             self.processor.embeddings))
+            return original_texts()
+        new_chunks.texts = texts
+        
+        self.processor.create_embeddings(new_chunks)
+        
+        assert observed == [(old_version, old_chunks, old_embeddings)]
+        assert self.processor.index_version == old_version + 1
+        assert self.processor.embeddings.shape[0] == len(self.processor.chunks) == 2
+    
+    def test_load_codec_error_is_not_swallowed(self, tmp_path, monkeypatch):
+        """Test que un almacén ilegible por el códec no se carga como vacío"""
+        self.processor.vector_store_path = str(tmp_path)
+        self._process_txt(tmp_path, "python.txt", "Python es un lenguaje de programación")
+        
+        def fail_load(path, mapped=False):
+            raise ChunkStoreCodecError("zstandard no instalado")
+        monkeypatch.setattr(CompactChunkStore, "load", staticmethod(fail_load))
+        
+        with pytest.raises(ChunkStoreCodecError):
+            DocumentProcessor(str(tmp_path)).load_vector_store()
+    
+    def test_warm_up(self):
+        """Test precalentamiento del vector store"""
+        assert self.processor.warm_up() is False
+        
+        self.processor.create_embeddings([("Texto de prueba 1", 1), ("Texto de prueba 2", 2)])
+        assert self.processor.warm_up() is True
+    
+    def test_rebuild_index_uses_extraction_cache(self, tmp_path):
+        """Test re-troceo con nuevos parámetros sin volver a leer los archivos"""
+        self.processor.vector_store_path = str(tmp_path)
+        self.processor.extraction_cache = PageExtractionCache(str(tmp_path / "cache"))
+        self.processor.chunk_size = 100
+        self.processor.chunk_overlap = 0
+        self._process_txt(tmp_path, "largo.txt", "Python es un lenguaje. " * 40, ["lenguajes"])
+        chunks_before = len(self.processor.chunks)
+        
+        def fail_read(path):
+            raise AssertionError("No debería leer el archivo original")
+        self.processor._read_txt_pages = fail_read
+        
+        self.processor.chunk_size = 300
+        self.processor.rebuild_index()
+        
+        assert len(self.processor.chunks) < chunks_before
+        assert self.processor.metadata.documents[0]["tags"] == ["lenguajes"]
+        assert len(self.processor.metadata) == len(self.processor.chunks)
+    
+    def test_rebuild_index_keeps_legacy_chunks(self, tmp_path):
+        """Test que un vector store antiguo (sin id de documento) se reconstruye sin fallar"""
+        self.processor.vector_store_path = str(tmp_path)
+        self.processor.extraction_cache = PageExtractionCache(str(tmp_path / "cache"))
+        self.processor.create_embeddings([("Texto antiguo sobre Python", 1), ("Otro texto antiguo", 2)])
+        self._process_txt(tmp_path, "fastapi.txt", "FastAPI es un framework web para Python", ["web"])
+        
+        self.processor.rebuild_index()
+        
+        assert len(self.processor.chunks) == 3
+        assert self.processor.metadata.documents[0]["document_id"] == "legacy"
+        assert self.processor.chunks[0][0] == "Texto antiguo sobre Python"
+        assert len(self.processor.metadata) == len(self.processor.chunks)
+    
+    def test_best_matching_sentence(self):
+        """Test selección de la frase más relevante de un chunk"""
+        self.processor.create_embeddings([
+            ("Python fue creado por Guido van Rossum. FastAPI es un framework web.", 1),
+            ("Machine learning es una rama de la IA", 2)
+        ])
+        
+        sentence, score = self.processor.best_matching_sentence(
+            "framework web", "Python fue creado por Guido van Rossum. FastAPI es un framework web."
+        )
+        assert sentence == "FastAPI es un framework web."
+        assert score > 0
@@ -0,0 +1,41 @@
+import pytest
+from app.services.extraction_cache import PageExtractionCache
+
+class TestPageExtractionCache:
+    def test_put_and_get_pages(self, tmp_path):
+        """Test guardado y lectura de todas las páginas"""
+        cache = PageExtractionCache(str(tmp_path))
+        pages = ["Página uno", "", "Página tres con acentos: canción"]
+        
+        assert cache.get_pages("abcdef0123456789") is None
+        cache.put_pages("abcdef0123456789", pages)
+        
+        assert cache.has("abcdef0123456789")
+        assert cache.get_pages("abcdef0123456789") == pages
+    
+    def test_get_single_page(self, tmp_path):
+        """Test lectura de una página concreta"""
+        cache = PageExtractionCache(str(tmp_path))
+        cache.put_pages("abcdef0123456789", ["uno", "dos", "tres"])
+        
+        assert cache.get_page("abcdef0123456789", 2) == "dos"
+        assert cache.get_page("abcdef0123456789", 4) is None
+    
+    def test_invalid_key(self, tmp_path):
+        """Test que las claves deben ser hashes hexadecimales"""
+        cache = PageExtractionCache(str(tmp_path))
+        
+        with pytest.raises(ValueError):
+            cache.put_pages("../fuera", ["texto"])
+    
+    def test_concurrent_puts_of_same_key(self, tmp_path):
+        """Test que guardar el mismo contenido desde varios hilos no choca"""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        cache = PageExtractionCache(str(tmp_path))
+        pages = ["uno", "dos", "tres"]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: cache.put_pages("abcdef0123456789", pages), range(32)))
+        
+        assert cache.get_pages("abcdef0123456789") == pages
+        assert [path.name for path in tmp_path.iterdir()] == ["abcdef0123456789.pages"]
@@ -0,0 +1,106 @@
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.services.out_of_core_indexer import (
+    OutOfCoreIndexBuilder, is_mapped, load_mapped_index, mapped_index_exists
+)
+from app.services.document_processor import DocumentProcessor
+
+TEXTS = [
+    "Python es un lenguaje de programación",
+    "Machine learning es una rama de la IA",
+    "FastAPI es un framework web escrito en Python",
+    "Los documentos se procesan por lotes",
+    "La búsqueda usa similitud coseno sobre TF-IDF"
+]
+
+class TestOutOfCoreIndexBuilder:
+    def test_batches_match_single_pass(self, tmp_path):
+        """Test que construir por lotes da el mismo índice que en una sola pasada"""
+        single = OutOfCoreIndexBuilder(str(tmp_path / "single"), n_features=2 ** 16)
+        single.add_batch(TEXTS)
+        _, single_matrix = single.finalize()
+        
+        batched = OutOfCoreIndexBuilder(str(tmp_path / "batched"), n_features=2 ** 16)
+        for start in range(0, len(TEXTS), 2):
+            batched.add_batch(TEXTS[start:start + 2])
+        vectorizer, batched_matrix = batched.finalize()
+        
+        assert len(batched.segments) == 3
+        assert batched_matrix.shape == (len(TEXTS), 2 ** 16)
+        assert np.allclose(batched_matrix.toarray(), single_matrix.toarray())
+        assert np.allclose(np.asarray(batched_matrix.multiply(batched_matrix).sum(axis=1)).ravel(), 1.0)
+        assert not (tmp_path / "batched" / "index_segments").exists()
+    
+    def test_index_is_memory_mapped(self, tmp_path):
+        """Test que el índice final se carga con mmap"""
+        builder = OutOfCoreIndexBuilder(str(tmp_path), n_features=2 ** 16)
+        builder.add_batch(TEXTS)
+        builder.finalize()
+        
+        assert mapped_index_exists(str(tmp_path))
+        assert is_mapped(load_mapped_index(str(tmp_path)))
+
+class TestOutOfCoreDocumentProcessor:
+    def test_process_and_search(self, tmp_path, monkeypatch):
+        """Test indexado fuera de memoria de extremo a extremo"""
+        monkeypatch.setenv("INDEX_BUILD_MODE", "out_of_core")
+        monkeypatch.setenv("INDEX_BATCH_SIZE", "2")
+        monkeypatch.setenv("INDEX_HASH_FEATURES", str(2 ** 16))
+        processor = DocumentProcessor(str(tmp_path / "store"))
+        
+        paths = []
+        for i, text in enumerate(TEXTS):
+            path = tmp_path / f"doc{i}.txt"
+            path.write_text(text, encoding="utf-8")
+            paths.append(str(path))
+        processor.process_documents(paths)
+        
+        results = processor.search_similar_chunks("framework web Python", top_k=1)
+        assert results[0][0] == TEXTS[2]
+        
+        loaded = DocumentProcessor(str(tmp_path / "store"))
+        assert loaded.load_vector_store()
+        assert is_mapped(loaded.embeddings)
+        assert loaded.search_similar_chunks("framework web Python", top_k=1)[0][0] == TEXTS[2]
+        # La matriz mapeada no cuenta para el presupuesto de memoria
+        assert loaded.memory_usage() == loaded.chunks.memory_usage() + loaded.metadata.memory_usage()
+        
+        # El texto ya indexado se lee del archivo mapeado al agregar documentos
+        assert loaded.chunks._mapped_file is not None
+        path = tmp_path / "nuevo.txt"
+        path.write_text("Django es otro framework web", encoding="utf-8")
+        loaded.process_documents([str(path)])
+        assert len(loaded.chunks) == len(TEXTS) + 1
+        assert loaded.search_similar_chunks("Django", top_k=1)[0][0] == "Django es otro framework web"
+        assert loaded.search_similar_chunks("framework web Python", top_k=1)[0][0] == TEXTS[2]
+
+    def test_concurrent_uploads(self, tmp_path, monkeypatch):
+        """Test que dos construcciones simultáneas no comparten segmentos ni temporales"""
+        monkeypatch.setenv("INDEX_BUILD_MODE", "out_of_core")
+        monkeypatch.setenv("INDEX_BATCH_SIZE", "2")
+        monkeypatch.setenv("INDEX_HASH_FEATURES", str(2 ** 16))
+        processor = DocumentProcessor(str(tmp_path / "store"))
+        
+        paths = []
+        for i, text in enumerate(TEXTS):
+            path = tmp_path / f"doc{i}.txt"
+            path.write_text(text, encoding="utf-8")
+            paths.append(str(path))
+        with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+            list(executor.map(processor.process_document, paths))
+        
+        loaded = DocumentProcessor(str(tmp_path / "store"))
+        assert loaded.load_vector_store()
+        assert len(loaded.chunks) == loaded.embeddings.shape[0] == len(TEXTS)
+        assert loaded.search_similar_chunks("framework web Python", top_k=1)[0][0] == TEXTS[2]
+
+class TestStartupImports:
+    def test_app_import_does_not_load_scipy(self):
+        """Test que importar la app no carga scipy (se importa de forma diferida)"""
+        code = "import sys, app.main; print('scipy' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().splitlines()[-1] == "False"
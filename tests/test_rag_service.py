@@ -1,7 +1,10 @@
+import asyncio
 import pytest
 from unittest.mock import Mock, AsyncMock
 from app.services.rag_service import RAGService
-from app.models.schemas import DocumentChunk
+from app.services.admission_controller import AdmissionController
+from app.services.document_processor import DocumentProcessor
+from app.models.schemas import DocumentChunk, SearchFilters
 
 class TestRAGService:
     def setup_method(self):
@@ -41,6 +44,208 @@ class TestRAGService:
         
         assert "No se encontraron chunks relevantes" in str(exc_info.value)
     
+    @pytest.mark.asyncio
+    async def test_filters_without_matches_return_no_answer(self):
+        """Test que unos filtros sin chunks dan una respuesta normal, no un error"""
+        self.rag_service.document_processor.search_similar_chunks.return_value = []
+        
+        response = await self.rag_service.answer_question(
+            "¿Qué es Python?", filters=SearchFilters(tags=["nomatch"])
+        )
+        
+        assert response.route == "no_answer"
+        assert response.context_chunks == []
+        self.rag_service.claude_client.generate_response.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_questions_are_coalesced(self):
+        """Test que preguntas idénticas concurrentes generan una sola respuesta"""
+        async def slow_response(context, question, **kwargs):
+            await asyncio.sleep(0.05)
+            return "Respuesta compartida"
+        
+        self.rag_service.claude_client.generate_response = AsyncMock(side_effect=slow_response)
+        
+        responses = await asyncio.gather(
+            self.rag_service.answer_question("¿Qué es Python?"),
+            self.rag_service.answer_question("¿qué es python?"),
+            self.rag_service.answer_question("¿Qué es Python?")
+        )
+        
+        assert self.rag_service.claude_client.generate_response.await_count == 1
+        assert all(response.answer == "Respuesta compartida" for response in responses)
+        assert responses[1].question == "¿qué es python?"
+    
+    @pytest.mark.asyncio
+    async def test_coalesced_followers_bypass_admission(self):
+        """Test que solo el líder de preguntas idénticas pasa por el control de admisión"""
+        async def slow_response(context, question, **kwargs):
+            await asyncio.sleep(0.05)
+            return "Respuesta compartida"
+        
+        self.rag_service.claude_client.generate_response = AsyncMock(side_effect=slow_response)
+        controller = AdmissionController(max_concurrency=1, max_queue=0)
+        admit = lambda compute: controller.run(compute)
+        
+        responses = await asyncio.gather(*[
+            self.rag_service.answer_question("¿Qué es Python?", admit=admit)
+            for _ in range(3)
+        ])
+        
+        assert all(response.answer == "Respuesta compartida" for response in responses)
+        assert controller.admitted == 1
+        assert controller.rejected == 0
+    
+    @pytest.mark.asyncio
+    async def test_low_scores_skip_llm(self):
+        """Test respuesta inmediata cuando nada supera el umbral de relevancia"""
+        self.rag_service.document_processor.search_similar_chunks.return_value = [
+            ("Contenido poco relacionado", 1, 0.01)
+        ]
+        
+        response = await self.rag_service.answer_question("¿Qué es Python?")
+        
+        assert response.route == "no_answer"
+        self.rag_service.claude_client.generate_response.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_extractive_answer_when_opted_in(self):
+        """Test respuesta extractiva para coincidencias claras si el cliente la acepta"""
+        self.rag_service.document_processor.search_similar_chunks.return_value = [
+            ("Python fue creado por Guido van Rossum. Es muy popular.", 4, 0.9),
+            ("Otro contenido", 2, 0.2)
+        ]
+        self.rag_service.document_processor.best_matching_sentence.return_value = (
+            "Python fue creado por Guido van Rossum.", 0.8
+        )
+        
+        response = await self.rag_service.answer_question("¿Quién creó Python?", allow_extractive=True)
+        assert response.route == "extractive"
+        assert response.answer == "Python fue creado por Guido van Rossum. (Página 4)"
+        self.rag_service.claude_client.generate_response.assert_not_awaited()
+        
+        # Sin opt-in se usa Claude
+        response = await self.rag_service.answer_question("¿Quién creó Python?")
+        assert response.route == "llm"
+    
+    @pytest.mark.asyncio
+    async def test_generation_budget_scales_with_context(self):
+        """Test que max_tokens y el modelo dependen del tamaño del contexto"""
+        self.rag_service.claude_client.fast_model = "modelo-rapido"
+        await self.rag_service.answer_question("¿Qué es Python?")
+        
+        kwargs = self.rag_service.claude_client.generate_response.await_args.kwargs
+        assert kwargs["max_tokens"] < self.rag_service.max_tokens
+        assert kwargs["model"] == "modelo-rapido"
+        
+        self.rag_service.document_processor.search_similar_chunks.return_value = [
+            ("Contenido largo " * 500, 1, 0.8)
+        ]
+        await self.rag_service.answer_question("Explica el documento")
+        
+        kwargs = self.rag_service.claude_client.generate_response.await_args.kwargs
+        assert kwargs["max_tokens"] == self.rag_service.max_tokens
+        assert kwargs["model"] is None
+    
+    def _index_documents(self, tmp_path, contents):
+        processor = DocumentProcessor(str(tmp_path))
+        for name, content in contents.items():
+            file_path = tmp_path / name
+            file_path.write_text(content, encoding="utf-8")
+            processor.process_document(str(file_path))
+        self.rag_service.document_processor = processor
+        return processor
+    
+    def test_search_returns_ranked_chunks_with_highlights(self, tmp_path):
+        """Test búsqueda sin generación con metadatos, resaltado y paginación"""
+        processor = self._index_documents(tmp_path, {
+            "python.txt": "Python es un lenguaje de programación",
+            "fastapi.txt": "FastAPI es un framework web para Python",
+            "sql.txt": "SQLAlchemy es un ORM para bases de datos"
+        })
+        
+        response = self.rag_service.search("Python framework", top_k=1)
+        
+        assert response.results[0].content == "FastAPI es un framework web para Python"
+        assert response.results[0].rank == 1
+        assert response.results[0].source == "fastapi.txt"
+        assert response.results[0].document_id == processor.metadata.documents[1]["document_id"]
+        assert [(h.start, h.end, h.term) for h in response.results[0].highlights] == [
+            (14, 23, "framework"), (33, 39, "python")
+        ]
+        assert response.has_more
+        self.rag_service.claude_client.generate_response.assert_not_called()
+        
+        next_page = self.rag_service.search("Python framework", top_k=1, offset=1)
+        assert next_page.cached
+        assert next_page.results[0].content == "Python es un lenguaje de programación"
+        assert next_page.results[0].rank == 2
+        assert not next_page.has_more
+    
+    def test_search_cache_invalidated_on_index_change(self, tmp_path):
+        """Test que un documento nuevo invalida los rankings cacheados"""
+        processor = self._index_documents(tmp_path, {
+            "python.txt": "Python es un lenguaje de programación"
+        })
+        
+        assert not self.rag_service.search("Python").cached
+        assert self.rag_service.search("python").cached
+        
+        file_path = tmp_path / "fastapi.txt"
+        file_path.write_text("FastAPI es un framework web para Python", encoding="utf-8")
+        processor.process_document(str(file_path))
+        
+        response = self.rag_service.search("Python")
+        assert not response.cached
+        assert len(response.results) == 2
+    
+    def test_search_during_rebuild_is_not_cached(self, tmp_path):
+        """Test que un ranking puntuado con el índice anterior no se cachea bajo el nuevo"""
+        processor = self._index_documents(tmp_path, {
+            "fastapi.txt": "FastAPI es un framework web para Python",
+            "sql.txt": "SQLAlchemy es un ORM para bases de datos"
+        })
+        processor.index_build_mode = "out_of_core"
+        processor.process_document(str(tmp_path / "fastapi.txt"))
+        
+        # Simula una subida en segundo plano que termina mientras se puntúa
+        original_search = processor.search_chunk_indices
+        def search_during_upload(*args, **kwargs):
+            ranking = original_search(*args, **kwargs)
+            file_path = tmp_path / "django.txt"
+            file_path.write_text("Django es otro framework web", encoding="utf-8")
+            processor.process_document(str(file_path))
+            return ranking
+        processor.search_chunk_indices = search_during_upload
+        
+        assert len(self.rag_service.search("framework").results) == 1
+        processor.search_chunk_indices = original_search
+        
+        response = self.rag_service.search("framework")
+        assert not response.cached
+        assert len(response.results) == 2
+    
+    def test_search_uses_one_index_snapshot(self, tmp_path):
+        """Test que textos y metadatos salen del índice con el que se puntuó"""
+        processor = self._index_documents(tmp_path, {
+            "fastapi.txt": "FastAPI es un framework web para Python"
+        })
+        
+        # Un documento nuevo se instala al principio del índice mientras se puntúa
+        original_search = processor.search_chunk_indices
+        def search_during_swap(*args, **kwargs):
+            ranking = original_search(*args, **kwargs)
+            processor.create_embeddings([
+                ("Django es otro framework web", 1),
+                ("FastAPI es un framework web para Python", 1)
+            ])
+            return ranking
+        processor.search_chunk_indices = search_during_swap
+        
+        response = self.rag_service.search("FastAPI")
+        assert response.results[0].content == "FastAPI es un framework web para Python"
+        assert response.results[0].source == "fastapi.txt"
+    
     def test_is_ready(self):
         """Test verificación de estado"""
         # Mock sistema listo
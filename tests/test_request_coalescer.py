@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from app.services.request_coalescer import RequestCoalescer, normalize_question
+
+class TestRequestCoalescer:
+    def setup_method(self):
+        """Setup para cada test"""
+        self.coalescer = RequestCoalescer()
+        self.calls = 0
+    
+    async def _slow_compute(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return "resultado"
+    
+    def test_normalize_question(self):
+        """Test normalización de preguntas equivalentes"""
+        assert normalize_question("¿Qué es  Python?") == normalize_question("qué es python")
+        assert normalize_question("¿Qué es Python?") != normalize_question("¿Qué es Java?")
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_result(self):
+        """Test que las llamadas concurrentes con la misma clave se ejecutan una vez"""
+        results = await asyncio.gather(*[
+            self.coalescer.run("clave", self._slow_compute) for _ in range(5)
+        ])
+        
+        assert results == ["resultado"] * 5
+        assert self.calls == 1
+        assert self.coalescer.coalesced_requests == 4
+        assert self.coalescer.in_flight() == 0
+    
+    @pytest.mark.asyncio
+    async def test_different_keys_run_separately(self):
+        """Test que claves distintas no se agrupan"""
+        await asyncio.gather(
+            self.coalescer.run("a", self._slow_compute),
+            self.coalescer.run("b", self._slow_compute)
+        )
+        assert self.calls == 2
+    
+    @pytest.mark.asyncio
+    async def test_exception_propagates_to_all_waiters(self):
+        """Test que un error se entrega a todas las llamadas agrupadas"""
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("fallo")
+        
+        results = await asyncio.gather(
+            self.coalescer.run("clave", failing),
+            self.coalescer.run("clave", failing),
+            return_exceptions=True
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+    
+    @pytest.mark.asyncio
+    async def test_cancel_when_no_waiters_left(self):
+        """Test que el cálculo compartido se cancela si todos los que esperan se cancelan"""
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+        
+        async def long_compute():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        
+        waiter = asyncio.ensure_future(self.coalescer.run("clave", long_compute))
+        await started.wait()
+        waiter.cancel()
+        
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        assert self.coalescer.in_flight() == 0
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+from app.models.schemas import SearchFilters
+from app.services.retrieval_batcher import RetrievalBatcher
+
+class TestRetrievalBatcher:
+    def setup_method(self):
+        """Setup para cada test"""
+        self.batcher = RetrievalBatcher(window_ms=20, max_batch_size=8)
+        self.processor = MagicMock()
+        self.processor.index_version = 1
+        self.processor.search_similar_chunks.side_effect = (
+            lambda query, top_k, filters: [(f"chunk {query}", 1, 0.9)]
+        )
+        self.processor.search_similar_chunks_batch.side_effect = (
+            lambda queries, top_k, filters: [[(f"chunk {query}", 1, 0.9)] for query in queries]
+        )
+
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_share_one_batch(self):
+        """Test que las búsquedas concurrentes se puntúan en una sola pasada"""
+        queries = [f"pregunta {i}" for i in range(5)]
+        results = await asyncio.gather(*[
+            self.batcher.search(self.processor, query, 3) for query in queries
+        ])
+
+        assert results == [[(f"chunk {query}", 1, 0.9)] for query in queries]
+        self.processor.search_similar_chunks_batch.assert_called_once()
+        self.processor.search_similar_chunks.assert_not_called()
+        assert self.batcher.stats()["batches"] == 1
+        assert self.batcher.stats()["batched_queries"] == 5
+
+    @pytest.mark.asyncio
+    async def test_single_query_uses_individual_search(self):
+        """Test que un lote de una sola query usa la búsqueda individual"""
+        results = await self.batcher.search(self.processor, "pregunta", 3)
+
+        assert results == [("chunk pregunta", 1, 0.9)]
+        self.processor.search_similar_chunks.assert_called_once()
+        self.processor.search_similar_chunks_batch.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size_flushes_early(self):
+        """Test que un lote lleno se ejecuta sin esperar la ventana"""
+        batcher = RetrievalBatcher(window_ms=10000, max_batch_size=2)
+
+        results = await asyncio.wait_for(asyncio.gather(
+            batcher.search(self.processor, "a", 3),
+            batcher.search(self.processor, "b", 3)
+        ), timeout=1)
+
+        assert results == [[("chunk a", 1, 0.9)], [("chunk b", 1, 0.9)]]
+
+    @pytest.mark.asyncio
+    async def test_different_filters_are_not_mixed(self):
+        """Test que las queries con filtros distintos van en lotes separados"""
+        filters = SearchFilters(tags=["web"])
+        await asyncio.gather(
+            self.batcher.search(self.processor, "a", 3),
+            self.batcher.search(self.processor, "b", 3, filters),
+            self.batcher.search(self.processor, "c", 3, filters)
+        )
+
+        self.processor.search_similar_chunks.assert_called_once_with("a", top_k=3, filters=None)
+        self.processor.search_similar_chunks_batch.assert_called_once_with(["b", "c"], top_k=3, filters=filters)
+
+    @pytest.mark.asyncio
+    async def test_exception_propagates_to_all_waiters(self):
+        """Test que un error del lote llega a todas las coroutines"""
+        self.processor.search_similar_chunks_batch.side_effect = ValueError("Vector store no inicializado")
+
+        results = await asyncio.gather(
+            self.batcher.search(self.processor, "a", 3),
+            self.batcher.search(self.processor, "b", 3),
+            return_exceptions=True
+        )
+
+        assert all(isinstance(result, ValueError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_disabled_searches_directly(self):
+        """Test que con ventana 0 no se agrupan búsquedas"""
+        batcher = RetrievalBatcher(window_ms=0)
+        await asyncio.gather(
+            batcher.search(self.processor, "a", 3),
+            batcher.search(self.processor, "b", 3)
+        )
+
+        assert self.processor.search_similar_chunks.call_count == 2
+        self.processor.search_similar_chunks_batch.assert_not_called()
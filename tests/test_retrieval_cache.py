@@ -0,0 +1,50 @@
+from app.services.retrieval_cache import RetrievalCache
+
+class TestRetrievalCache:
+    def setup_method(self):
+        """Setup para cada test"""
+        self.cache = RetrievalCache(max_entries=2)
+        self.ranking = [(3, 0.9), (1, 0.5), (7, 0.2)]
+        self.matrix = object()
+
+    def test_hit_within_cached_depth(self):
+        """Test que una búsqueda repetida se sirve de la caché"""
+        assert self.cache.get(1, self.matrix, "python", 3) is None
+        self.cache.put(1, self.matrix, "python", 3, self.ranking)
+
+        assert self.cache.get(1, self.matrix, "python", 2) == self.ranking
+        assert self.cache.stats()["hits"] == 1
+        assert self.cache.stats()["misses"] == 1
+
+    def test_deeper_request_misses_unless_exhausted(self):
+        """Test que pedir más posiciones de las calculadas recalcula"""
+        self.cache.put(1, self.matrix, "python", 3, self.ranking)
+        assert self.cache.get(1, self.matrix, "python", 10) is None
+
+        # Un ranking más corto que su profundidad ya tiene todos los resultados
+        self.cache.put(1, self.matrix, "fastapi", 10, self.ranking)
+        assert self.cache.get(1, self.matrix, "fastapi", 50) == self.ranking
+
+    def test_index_change_invalidates(self):
+        """Test que un cambio de versión del índice vacía la caché"""
+        self.cache.put(1, self.matrix, "python", 3, self.ranking)
+
+        assert self.cache.get(2, self.matrix, "python", 3) is None
+        assert len(self.cache) == 0
+
+    def test_matrix_change_invalidates(self):
+        """Test que un ranking puntuado con otra matriz no se sirve"""
+        self.cache.put(1, self.matrix, "python", 3, self.ranking)
+
+        assert self.cache.get(1, object(), "python", 3) is None
+        assert len(self.cache) == 0
+
+    def test_lru_eviction(self):
+        """Test que se descarta la entrada usada hace más tiempo"""
+        self.cache.put(1, self.matrix, "a", 3, self.ranking)
+        self.cache.put(1, self.matrix, "b", 3, self.ranking)
+        self.cache.get(1, self.matrix, "a", 3)
+        self.cache.put(1, self.matrix, "c", 3, self.ranking)
+
+        assert self.cache.get(1, self.matrix, "b", 3) is None
+        assert self.cache.get(1, self.matrix, "a", 3) == self.ranking